@@ -6,13 +6,13 @@ Complete rebuild with consistent data structures and full integration
 import os
 import json
 import traceback
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Any
 from collections import defaultdict
 import asyncio
 
 # Database imports
-from database import interactions_container
+from database import interactions_container, MEAL_TYPE_TIMEZONE
 
 # OpenAI client
 from openai import AzureOpenAI
@@ -220,10 +220,8 @@ class ConsumptionTracker:
         try:
             # Use local time for meal type determination
             # Default to US Eastern timezone as a reasonable assumption
-            import pytz
-            eastern = pytz.timezone('America/New_York')
-            utc_time = timestamp.replace(tzinfo=pytz.utc)
-            local_time = utc_time.astimezone(eastern)
+            utc_time = timestamp.replace(tzinfo=timezone.utc)
+            local_time = utc_time.astimezone(MEAL_TYPE_TIMEZONE)
             hour = local_time.hour
         except:
             # Fallback to UTC if timezone conversion fails
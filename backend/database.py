@@ -2,26 +2,34 @@ import os
 from azure.cosmos import CosmosClient
 from azure.cosmos.exceptions import CosmosResourceNotFoundError
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from collections import defaultdict
+from zoneinfo import ZoneInfo
 import uuid
+import asyncio
 import tiktoken
 import json
 import traceback
 import logging
 from openai import AzureOpenAI
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
 # Load environment variables
 load_dotenv()
 
+# Set up logging; LOG_LEVEL=DEBUG turns on the per-request diagnostics. An unknown
+# level name falls back to INFO instead of failing at import
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL if isinstance(logging.getLevelName(LOG_LEVEL), int) else logging.INFO)
+logger = logging.getLogger(__name__)
+
 # Cosmos DB configuration
 COSMOS_CONNECTION_STRING = os.getenv("COSMO_DB_CONNECTION_STRING")
 INTERACTIONS_CONTAINER = os.getenv("INTERACTIONS_CONTAINER")
 USER_INFORMATION_CONTAINER = os.getenv("USER_INFORMATION_CONTAINER")
 
+# Meal types are inferred in US Eastern time until user timezones reach this module
+MEAL_TYPE_TIMEZONE = ZoneInfo('America/New_York')
+
 # Initialize Cosmos DB client
 client = CosmosClient.from_connection_string(COSMOS_CONNECTION_STRING)
 database = client.get_database_client("diabetes_diet_manager")
@@ -236,10 +244,11 @@ async def get_user_meal_plans(user_id: str, limit: int = None):
         else:
             query = f"SELECT * FROM c WHERE c.type = 'meal_plan' AND c.user_id = '{user_id}' ORDER BY c.created_at DESC"
         
-        meal_plans = list(interactions_container.query_items(
+        # Run the blocking SDK query off the event loop so callers can overlap it
+        meal_plans = await asyncio.to_thread(lambda: list(interactions_container.query_items(
             query=query,
             enable_cross_partition_query=True
-        ))
+        )))
 
         # Validate each meal plan has required fields
         for plan in meal_plans:
@@ -701,12 +710,10 @@ async def save_consumption_record(user_id: str, consumption_data: dict, meal_typ
             
             # Assume most users are in US timezones (EST/PST), so subtract 5-8 hours from UTC
             # This is a rough approximation - in a production system, we'd store user timezone
-            import pytz
             try:
                 # Default to US Eastern timezone as a reasonable assumption
-                eastern = pytz.timezone('America/New_York')
-                utc_time = current_time.replace(tzinfo=pytz.utc)
-                local_time = utc_time.astimezone(eastern)
+                utc_time = current_time.replace(tzinfo=timezone.utc)
+                local_time = utc_time.astimezone(MEAL_TYPE_TIMEZONE)
                 hour = local_time.hour
             except:
                 # Fallback to UTC if timezone conversion fails
@@ -776,11 +783,12 @@ async def get_user_consumption_history(user_id: str, limit: int = 50):
         print(f"[get_user_consumption_history] Query: {query}")
         
         try:
-            # Use cross-partition query since records are partitioned by session_id
-            consumption_records = list(interactions_container.query_items(
+            # Use cross-partition query since records are partitioned by session_id;
+            # the blocking SDK call runs off the event loop so callers can overlap it
+            consumption_records = await asyncio.to_thread(lambda: list(interactions_container.query_items(
                 query=query,
                 enable_cross_partition_query=True
-            ))
+            )))
             print(f"[get_user_consumption_history] Query executed successfully")
         except Exception as query_error:
             print(f"[get_user_consumption_history] Error executing query: {str(query_error)}")
@@ -806,6 +814,72 @@ async def get_user_consumption_history(user_id: str, limit: int = 50):
         print(f"[get_user_consumption_history] Full error details:", traceback.format_exc())
         raise Exception(f"Failed to get consumption history: {str(e)}")
 
+_TOTAL_FIELDS = ("calories", "protein", "carbs", "fat")
+
+async def get_consumption_totals_by_window(user_id: str, windows: dict):
+    """Sum calories and macros for several [start_iso, end_iso) windows with a single query.
+
+    windows maps a name to (start_iso, end_iso); returns {name: totals}.
+    """
+    try:
+        if not user_id:
+            raise ValueError("User ID is required")
+
+        earliest = min(start for start, _ in windows.values())
+        latest = max(end for _, end in windows.values())
+
+        # Only the timestamp and the four summed fields are projected so image
+        # payloads and analysis text never leave the database
+        query = (
+            "SELECT c.timestamp, c.nutritional_info.calories AS calories, c.nutritional_info.protein AS protein, "
+            "(c.nutritional_info.carbohydrates ?? c.nutritional_info.carbs) AS carbs, c.nutritional_info.fat AS fat "
+            "FROM c WHERE c.type = 'consumption_record' "
+            f"AND c.user_id = '{user_id}' "
+            f"AND c.timestamp >= '{earliest}' AND c.timestamp < '{latest}'"
+        )
+
+        # Run the blocking SDK query off the event loop so callers can overlap it
+        rows = await asyncio.to_thread(
+            lambda: list(interactions_container.query_items(query=query, enable_cross_partition_query=True))
+        )
+
+        results = {name: dict.fromkeys(_TOTAL_FIELDS, 0) for name in windows}
+        for row in rows:
+            timestamp = row.get("timestamp", "")
+            for name, (start, end) in windows.items():
+                if start <= timestamp < end:
+                    totals = results[name]
+                    for key in _TOTAL_FIELDS:
+                        totals[key] += row.get(key, 0)
+        return results
+
+    except ValueError as e:
+        raise ValueError(f"Invalid request: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Failed to get consumption totals: {str(e)}")
+
+async def get_consumption_log_days(user_id: str, since_iso: str):
+    """Return the UTC date (YYYY-MM-DD) of every consumption record logged since since_iso"""
+    try:
+        if not user_id:
+            raise ValueError("User ID is required")
+
+        # One 10-character string per record instead of the whole document
+        query = (
+            "SELECT VALUE SUBSTRING(c.timestamp, 0, 10) "
+            "FROM c WHERE c.type = 'consumption_record' "
+            f"AND c.user_id = '{user_id}' "
+            f"AND c.timestamp >= '{since_iso}'"
+        )
+        return await asyncio.to_thread(
+            lambda: list(interactions_container.query_items(query=query, enable_cross_partition_query=True))
+        )
+
+    except ValueError as e:
+        raise ValueError(f"Invalid request: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Failed to get consumption log days: {str(e)}")
+
 async def get_consumption_analytics(user_id: str, days: int = 7):
     """Get comprehensive consumption analytics for a user over specified days"""
     try:
@@ -813,18 +887,14 @@ async def get_consumption_analytics(user_id: str, days: int = 7):
             raise ValueError("User ID is required")
             
         # Calculate date threshold
-        from datetime import datetime, timedelta
-        from collections import defaultdict
-        import re
-        
         threshold_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
         
         query = f"SELECT * FROM c WHERE c.type = 'consumption_record' AND c.user_id = '{user_id}' AND c.timestamp >= '{threshold_date}' ORDER BY c.timestamp DESC"
         
-        consumption_records = list(interactions_container.query_items(
+        consumption_records = await asyncio.to_thread(lambda: list(interactions_container.query_items(
             query=query,
             enable_cross_partition_query=True
-        ))
+        )))
         
         if not consumption_records:
             # Return empty analytics structure
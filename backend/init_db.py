@@ -11,6 +11,56 @@ DATABASE_NAME = "diabetes_diet_manager"
 USER_INFORMATION_CONTAINER = "user_information"
 INTERACTIONS_CONTAINER = "interactions"
 
+# Consumption queries filter on type and user_id and range over timestamp.
+# Base64 images and free-text analysis are never filtered on, so they stay
+# out of the index to keep writes and index size small.
+INTERACTIONS_INDEXING_POLICY = {
+    "indexingMode": "consistent",
+    "includedPaths": [{"path": "/*"}],
+    "excludedPaths": [
+        {"path": "/\"_etag\"/?"},
+        {"path": "/image_url/?"},
+        {"path": "/image_analysis/?"}
+    ],
+    "compositeIndexes": [
+        [
+            {"path": "/user_id", "order": "ascending"},
+            {"path": "/timestamp", "order": "descending"}
+        ],
+        [
+            {"path": "/type", "order": "ascending"},
+            {"path": "/user_id", "order": "ascending"},
+            {"path": "/timestamp", "order": "descending"}
+        ]
+    ]
+}
+
+def indexing_policy_key(policy):
+    """Comparable form of an indexing policy; ignores ordering and server-added fields"""
+    return (
+        policy.get("indexingMode", "consistent").lower(),
+        frozenset(p["path"] for p in policy.get("includedPaths", [])),
+        frozenset(p["path"] for p in policy.get("excludedPaths", [])),
+        frozenset(
+            tuple((p["path"], p.get("order", "ascending").lower()) for p in index)
+            for index in policy.get("compositeIndexes", [])
+        )
+    )
+
+def ensure_indexing_policy(database, container_id, partition_key, indexing_policy):
+    """Replace an existing container's indexing policy only when it differs, keeping its TTL"""
+    properties = database.get_container_client(container_id).read()
+    if indexing_policy_key(properties.get("indexingPolicy", {})) == indexing_policy_key(indexing_policy):
+        print(f"Indexing policy for {container_id} is up to date")
+        return
+    database.replace_container(
+        container_id,
+        partition_key=partition_key,
+        indexing_policy=indexing_policy,
+        default_ttl=properties.get("defaultTtl")
+    )
+    print(f"Updated indexing policy for {container_id}")
+
 def init_database():
     try:
         # Initialize Cosmos DB client
@@ -44,12 +94,24 @@ def init_database():
         try:
             interactions_container = database.create_container(
                 id=INTERACTIONS_CONTAINER,
-                partition_key=PartitionKey(path="/session_id")
+                partition_key=PartitionKey(path="/session_id"),
+                indexing_policy=INTERACTIONS_INDEXING_POLICY
             )
             print(f"Created container: {INTERACTIONS_CONTAINER}")
         except Exception as e:
             if "Conflict" in str(e):
                 print(f"Container {INTERACTIONS_CONTAINER} already exists")
+                # Bring the existing container up to the current indexing policy; a failed
+                # migration leaves the container usable, so it doesn't fail the init
+                try:
+                    ensure_indexing_policy(
+                        database,
+                        INTERACTIONS_CONTAINER,
+                        PartitionKey(path="/session_id"),
+                        INTERACTIONS_INDEXING_POLICY
+                    )
+                except Exception as policy_error:
+                    print(f"Could not update indexing policy for {INTERACTIONS_CONTAINER}: {str(policy_error)}")
             else:
                 raise e
 
@@ -1,14 +1,15 @@
 from fastapi import FastAPI, HTTPException, Depends, status, Request, Body, File, UploadFile, Form
-from fastapi.responses import StreamingResponse, JSONResponse, FileResponse, Response
+from fastapi.responses import StreamingResponse, JSONResponse, ORJSONResponse, FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import os
 from dotenv import load_dotenv
 from openai import AzureOpenAI
 import json
-from datetime import datetime, timedelta
+import orjson
+from datetime import date, datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from twilio.rest import Client
@@ -36,6 +37,8 @@ from database import (
     save_consumption_record,
     get_user_consumption_history,
     get_consumption_analytics,
+    get_consumption_totals_by_window,
+    get_consumption_log_days,
     get_user_meal_history,
     log_meal_suggestion,
     get_ai_suggestion,
@@ -48,7 +51,8 @@ import uuid
 from io import BytesIO
 from reportlab.lib.pagesizes import letter, landscape
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image as RLImage, PageBreak
-import pytz
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from functools import lru_cache
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
@@ -60,15 +64,20 @@ from PIL import Image
 import base64
 from fastapi import APIRouter
 import logging
-from collections import defaultdict
-
-# Set up logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from types import MappingProxyType
+from cachetools import TTLCache
 
 # Load environment variables
 load_dotenv()
 
+# Set up logging; LOG_LEVEL=DEBUG turns on the per-request diagnostics. An unknown
+# level name falls back to INFO instead of failing at import
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL if isinstance(logging.getLevelName(LOG_LEVEL), int) else logging.INFO)
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="Diabetes Diet Manager API")
 
 # Configure CORS
@@ -86,6 +95,8 @@ client = AzureOpenAI(
     azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
     api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
 )
+# Deployment name is fixed for the life of the process
+AZURE_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
 
 # Configure Twilio
 twilio_client = Client(os.getenv("SMS_API_SID"), os.getenv("SMS_KEY"))
@@ -122,7 +133,7 @@ async def robust_openai_call(
             
             # Prepare the API call parameters
             api_params = {
-                "model": os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+                "model": AZURE_DEPLOYMENT,
                 "messages": messages,
                 "temperature": temperature,
                 "max_tokens": max_tokens,
@@ -133,8 +144,8 @@ async def robust_openai_call(
             if response_format:
                 api_params["response_format"] = response_format
                 
-            # Make the API call
-            response = client.chat.completions.create(**api_params)
+            # Make the API call off the event loop; the client is synchronous
+            response = await asyncio.to_thread(client.chat.completions.create, **api_params)
             
             # Validate the response
             if not response.choices or not response.choices[0].message:
@@ -194,6 +205,15 @@ async def robust_openai_call(
     }
 
 # Helper function to parse JSON with better error handling
+def parse_json_object(text: str) -> Any:
+    """
+    Parse the span from the first '{' to the last '}' of an AI reply with orjson.
+    Raises orjson.JSONDecodeError (a json.JSONDecodeError / ValueError) when the span is missing or invalid.
+    """
+    start_idx = text.find('{')
+    end_idx = text.rfind('}') + 1
+    return orjson.loads(text[start_idx:end_idx])
+
 def robust_json_parse(json_string: str, context: str = "json_parse") -> Dict[str, Any]:
     """
     Parse JSON string with better error handling and fallback mechanisms.
@@ -257,13 +277,18 @@ def generate_fallback_meal_plan(user_profile: dict, days: int = 7) -> dict:
     allergies = user_profile.get('allergies', [])
     diet_type = user_profile.get('dietType', [])
     
+    # Join each list once so every check below is a single substring test; the
+    # separator keeps a keyword from matching across two entries
+    restrictions_text = " | ".join(str(restriction).lower() for restriction in dietary_restrictions + diet_type)
+    allergies_text = " | ".join(str(allergy).lower() for allergy in allergies)
+    
     # Check if user is vegetarian
-    is_vegetarian = any('vegetarian' in str(restriction).lower() for restriction in dietary_restrictions + diet_type)
+    is_vegetarian = 'vegetarian' in restrictions_text
     
     # Check for allergies
-    has_egg_allergy = any('egg' in str(allergy).lower() for allergy in allergies)
-    has_dairy_allergy = any('dairy' in str(allergy).lower() or 'milk' in str(allergy).lower() for allergy in allergies)
-    has_gluten_allergy = any('gluten' in str(allergy).lower() or 'wheat' in str(allergy).lower() for allergy in allergies)
+    has_egg_allergy = 'egg' in allergies_text
+    has_dairy_allergy = 'dairy' in allergies_text or 'milk' in allergies_text
+    has_gluten_allergy = 'gluten' in allergies_text or 'wheat' in allergies_text
     
     # Safe breakfast options
     breakfast_options = [
@@ -679,12 +704,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_today_utc_boundaries():
+def get_today_utc_boundaries(now_utc: Optional[datetime] = None):
     """
     Get today's UTC boundaries for proper daily filtering.
     Returns start and end of today in UTC.
+    Pass now_utc to derive them from a clock reading the caller already took.
     """
-    now_utc = datetime.utcnow()
+    if now_utc is None:
+        now_utc = datetime.utcnow()
     
     # Get start of today (00:00:00 UTC)
     start_of_today = now_utc.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -694,6 +721,22 @@ def get_today_utc_boundaries():
     
     return start_of_today, start_of_tomorrow
 
+_UTC = ZoneInfo("UTC")
+
+# Shared read-only stand-in for records without nutritional_info
+_EMPTY_NUTRITION: Dict[str, Any] = {}
+
+@lru_cache(maxsize=512)
+def get_zoneinfo(name: str) -> ZoneInfo:
+    """Resolve an IANA timezone name, falling back to UTC for unknown or malformed names.
+
+    Cached since users share a small set of zones.
+    """
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return _UTC
+
 def get_user_timezone_boundaries(user_timezone: str = "UTC"):
     """
     Get today's boundaries in the user's timezone, converted to UTC.
@@ -708,6 +751,19 @@ def get_user_timezone_boundaries(user_timezone: str = "UTC"):
         # Fall back to UTC boundaries
         return get_today_utc_boundaries()
 
+def parse_record_timestamp(record: Dict[str, Any]) -> Optional[datetime]:
+    """
+    Parse a consumption record's ISO timestamp as a naive UTC datetime.
+    Returns None when the timestamp is missing or malformed.
+    """
+    timestamp_str = record.get("timestamp")
+    if not timestamp_str:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp_str.replace("Z", "+00:00")).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
 def filter_today_records(records: List[Dict[str, Any]], user_timezone: str = "UTC") -> List[Dict[str, Any]]:
     """
     Filter consumption records to only include those from today (user's timezone).
@@ -715,28 +771,11 @@ def filter_today_records(records: List[Dict[str, Any]], user_timezone: str = "UT
     """
     start_of_today_utc, start_of_tomorrow_utc = get_user_timezone_boundaries(user_timezone)
     
-    today_records = []
-    for record in records:
-        try:
-            timestamp_str = record.get("timestamp", "")
-            if not timestamp_str:
-                continue
-                
-            # Parse the timestamp
-            record_timestamp = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
-            
-            # Remove timezone info for comparison (already in UTC)
-            record_timestamp_utc = record_timestamp.replace(tzinfo=None)
-            
-            # Check if the record is from today
-            if start_of_today_utc <= record_timestamp_utc < start_of_tomorrow_utc:
-                today_records.append(record)
-                
-        except Exception as e:
-            print(f"Error parsing timestamp for record: {e}")
-            continue
-    
-    return today_records
+    # Missing or malformed timestamps parse to None and are skipped below
+    return [
+        record for record, record_timestamp in zip(records, map(parse_record_timestamp, records))
+        if record_timestamp is not None and start_of_today_utc <= record_timestamp < start_of_tomorrow_utc
+    ]
 
 async def generate_consumption_aware_meal_plan(base_meal_plan: dict, consumption_analysis: dict, remaining_meals: list, user_profile: dict) -> dict:
     """
@@ -842,24 +881,34 @@ async def generate_consumption_aware_meal_plan(base_meal_plan: dict, consumption
         
     except Exception as e:
         print(f"[generate_consumption_aware_meal_plan] Error: {e}")
-        import traceback
         print(traceback.format_exc())
         return base_meal_plan
 
 
-async def trigger_meal_plan_recalibration(user_email: str, user_profile: dict):
+async def trigger_meal_plan_recalibration(
+    user_email: str,
+    user_profile: dict,
+    today_consumption: Optional[List[Dict[str, Any]]] = None,
+    calories_consumed: Optional[float] = None,
+):
     """
     Comprehensive meal plan recalibration system that triggers after every food log.
     Ensures dietary restrictions are respected and meal plan is updated immediately.
+    Callers that already loaded today's records (including the new log) can pass
+    them as today_consumption, and their calorie sum as calories_consumed, to skip
+    a second history query and summation.
     """
     try:
         print(f"[RECALIBRATION] Starting meal plan recalibration for user {user_email}")
         
         # Get today's consumption including the new log
-        today_consumption = await get_today_consumption_records_async(user_email, user_timezone="UTC")
+        if today_consumption is None:
+            today_consumption = await get_today_consumption_records_async(user_email, user_timezone="UTC")
+            calories_consumed = None
         
         # Calculate calories consumed so far
-        calories_consumed = sum(r.get("nutritional_info", {}).get("calories", 0) for r in today_consumption)
+        if calories_consumed is None:
+            calories_consumed = sum(r.get("nutritional_info", {}).get("calories", 0) for r in today_consumption)
         
         # Get user's dietary restrictions and preferences
         dietary_restrictions = user_profile.get('dietaryRestrictions', [])
@@ -871,8 +920,7 @@ async def trigger_meal_plan_recalibration(user_email: str, user_profile: dict):
         remaining_calories = max(0, target_calories - calories_consumed)
         
         # Check if user is vegetarian or has restrictions
-        is_vegetarian = 'vegetarian' in [r.lower() for r in dietary_restrictions] or 'vegetarian' in [d.lower() for d in diet_type]
-        no_eggs = any('egg' in r.lower() for r in dietary_restrictions) or any('egg' in a.lower() for a in allergies)
+        is_vegetarian, no_eggs, _ = dietary_flags(dietary_restrictions, allergies, diet_type)
         
         print(f"[RECALIBRATION] User dietary profile: vegetarian={is_vegetarian}, no_eggs={no_eggs}")
         print(f"[RECALIBRATION] Cuisine preferences: {diet_type}")
@@ -934,13 +982,13 @@ async def trigger_meal_plan_recalibration(user_email: str, user_profile: dict):
         # Save the updated meal plan
         if fresh_meal_plan:
             await save_meal_plan(user_email, fresh_meal_plan)
+            invalidate_meal_plan_cache(user_email)
             print(f"[RECALIBRATION] Successfully updated consumption-aware meal plan for user {user_email}")
         
         return fresh_meal_plan
         
     except Exception as e:
         print(f"[RECALIBRATION] Error in meal plan recalibration: {e}")
-        import traceback
         print(traceback.format_exc())
         return None
 
@@ -959,20 +1007,15 @@ async def generate_fresh_adaptive_meal_plan(user_email: str, today_consumption:
         if strong_dislikes is None:
             strong_dislikes = []
         
-        today = datetime.utcnow().date()
-        current_hour = datetime.utcnow().hour
+        now = datetime.utcnow()
+        today = now.date()
+        current_hour = now.hour
         
         # Determine what meals are still needed today
         remaining_meals = get_remaining_meals_by_time(current_hour)
         
         # Build restriction warnings for AI
-        restriction_warnings = []
-        if is_vegetarian:
-            restriction_warnings.append("STRICTLY VEGETARIAN - NO MEAT, POULTRY, FISH, OR SEAFOOD")
-        if no_eggs:
-            restriction_warnings.append("NO EGGS - Avoid all egg-based dishes and ingredients")
-        if any('nut' in a.lower() for a in allergies):
-            restriction_warnings.append("NUT ALLERGY - Avoid all nuts and nut-based products")
+        restriction_warnings = build_restriction_warnings(dietary_restrictions, allergies, diet_type)
         
         restriction_text = "\n".join([f"⚠️ {warning}" for warning in restriction_warnings])
         
@@ -1068,7 +1111,7 @@ SNACK LOGIC:
 Ensure maximum variety within the specified cuisine type and completely avoid any meat, poultry, fish, seafood, or egg-based ingredients if restricted."""
 
         try:
-            model_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+            model_name = AZURE_DEPLOYMENT
             if not model_name:
                 raise Exception("AZURE_OPENAI_DEPLOYMENT_NAME not configured")
                 
@@ -1087,23 +1130,23 @@ Ensure maximum variety within the specified cuisine type and completely avoid an
             end_idx = ai_content.rfind('}') + 1
             
             if start_idx != -1 and end_idx != -1:
-                import json
-                ai_json = json.loads(ai_content[start_idx:end_idx])
+                ai_json = orjson.loads(ai_content[start_idx:end_idx])
                 
                 # Apply safety filter to ensure dietary compliance
                 safe_meals = {}
                 for meal_type, dish in ai_json.get("meals", {}).items():
                     safe_meals[meal_type] = sanitize_vegetarian_meal(dish, is_vegetarian, no_eggs)
                 
-                # Create the meal plan
+                # Create the meal plan; id and created_at share one timestamp
+                created_at = datetime.utcnow()
                 meal_plan = {
-                    "id": f"adaptive_{user_email}_{today.isoformat()}_{int(datetime.utcnow().timestamp())}",
+                    "id": f"adaptive_{user_email}_{today.isoformat()}_{int(created_at.timestamp())}",
                     "date": today.isoformat(),
                     "type": "adaptive_recalibrated",
                     "meals": safe_meals,
                     "dailyCalories": int(remaining_calories) + sum(r.get("nutritional_info", {}).get("calories", 0) for r in today_consumption),
                     "remaining_calories": remaining_calories,
-                    "created_at": datetime.utcnow().isoformat(),
+                    "created_at": created_at.isoformat(),
                     "consumption_triggered": True,
                     "notes": f"Adaptive meal plan updated after food logging. Remaining calories: {remaining_calories}"
                 }
@@ -1659,6 +1702,7 @@ async def save_patient_profile(
         
         # Save to database
         user_container.upsert_item(body=profile_record)
+        invalidate_profile_caches(user_email)
         
         return {
             "message": "Patient profile saved successfully",
@@ -1840,6 +1884,10 @@ def generate_recipe_prompt(meal_name: str, user_profile: UserProfile) -> str:
 # COMPREHENSIVE AI HEALTH COACH SYSTEM
 # ============================================================================
 
+def get_medical_conditions(profile: Dict[str, Any]) -> List[str]:
+    """Medical conditions from a profile, accepting both the camelCase and legacy snake_case keys."""
+    return profile.get("medicalConditions") or profile.get("medical_conditions") or []
+
 async def get_comprehensive_user_context(user_email: str):
     """
     Get complete user context including profile, consumption history, meal plans, and health conditions.
@@ -1858,7 +1906,7 @@ async def get_comprehensive_user_context(user_email: str):
         latest_meal_plan = meal_plans[0] if meal_plans else None
         
         # Extract health conditions and medications
-        medical_conditions = user_profile.get("medicalConditions", []) or user_profile.get("medical_conditions", [])
+        medical_conditions = get_medical_conditions(user_profile)
         current_medications = user_profile.get("currentMedications", [])
         
         # Get dietary restrictions and preferences
@@ -1891,6 +1939,9 @@ async def get_comprehensive_user_context(user_email: str):
         condition_adherence = {"total_meals": 0, "condition_friendly": 0}
         favorite_foods = {}
         
+        # Rating keys per condition are the same for every entry; with no conditions every meal counts as suitable
+        condition_rating_keys = [f"{str(condition).lower()}_suitability" for condition in medical_conditions]
+        
         for entry in consumption_history:
             try:
                 entry_date = datetime.fromisoformat(entry.get("timestamp", "").replace("Z", "+00:00"))
@@ -1911,8 +1962,7 @@ async def get_comprehensive_user_context(user_email: str):
                     
                     # Check suitability for user's specific conditions
                     is_suitable = True
-                    for condition in medical_conditions:
-                        condition_key = f"{condition.lower()}_suitability"
+                    for condition_key in condition_rating_keys:
                         if condition_key in medical_rating:
                             suitability = medical_rating[condition_key].lower()
                             if suitability not in ["high", "good", "suitable"]:
@@ -1940,6 +1990,7 @@ async def get_comprehensive_user_context(user_email: str):
         return {
             "user_profile": {
                 "medical_conditions": medical_conditions,
+                "total_medical_conditions": len(medical_conditions),
                 "current_medications": current_medications,
                 "dietary_restrictions": dietary_restrictions,
                 "dietary_features": dietary_features,
@@ -1974,6 +2025,29 @@ async def get_comprehensive_user_context(user_email: str):
         print(f"Error getting comprehensive user context: {str(e)}")
         return None
 
+# Condition keywords in precedence order; a condition gets the first category it mentions
+_CONDITION_GUIDELINES = (
+    ("diabetes", ("diabetes",), "- Diabetes: Low glycemic index foods, controlled carbohydrates, high fiber"),
+    ("hypertension", ("hypertension", "blood pressure"), "- Hypertension: Low sodium (<2300mg/day), DASH diet, potassium-rich foods"),
+    ("heart", ("heart", "cardiac"), "- Heart Disease: Low saturated fat, omega-3 fatty acids, whole grains"),
+    ("kidney", ("kidney", "renal"), "- Kidney Disease: Controlled protein, phosphorus, and potassium"),
+    ("pcos", ("pcos",), "- PCOS: Low glycemic index, anti-inflammatory foods, balanced macros"),
+    ("thyroid", ("thyroid",), "- Thyroid: Iodine-rich foods, selenium, avoid goitrogens"),
+    ("cholesterol", ("cholesterol",), "- High Cholesterol: Low saturated fat, high fiber, plant sterols"),
+    ("weight", ("obesity", "weight"), "- Weight Management: Calorie control, portion sizes, nutrient density"),
+)
+
+# Each branch is a lookahead over the whole string, so alternation order keeps the precedence
+_CONDITION_RE = re.compile(
+    "|".join(
+        rf"(?=.*?(?P<{tag}>{'|'.join(map(re.escape, keywords))}))"
+        for tag, keywords, _ in _CONDITION_GUIDELINES
+    ),
+    flags=re.IGNORECASE | re.DOTALL,
+)
+
+_GUIDELINE_BY_TAG = {tag: guideline for tag, _, guideline in _CONDITION_GUIDELINES}
+
 async def get_ai_health_coach_response(user_context: dict, query_type: str, specific_data: dict = None):
     """
     Unified AI Health Coach that provides personalized responses for ALL health conditions.
@@ -2002,23 +2076,9 @@ async def get_ai_health_coach_response(user_context: dict, query_type: str, spec
             # Add condition-specific dietary guidelines
             condition_guidelines = []
             for condition in health_conditions:
-                condition_lower = condition.lower()
-                if "diabetes" in condition_lower:
-                    condition_guidelines.append("- Diabetes: Low glycemic index foods, controlled carbohydrates, high fiber")
-                elif "hypertension" in condition_lower or "blood pressure" in condition_lower:
-                    condition_guidelines.append("- Hypertension: Low sodium (<2300mg/day), DASH diet, potassium-rich foods")
-                elif "heart" in condition_lower or "cardiac" in condition_lower:
-                    condition_guidelines.append("- Heart Disease: Low saturated fat, omega-3 fatty acids, whole grains")
-                elif "kidney" in condition_lower or "renal" in condition_lower:
-                    condition_guidelines.append("- Kidney Disease: Controlled protein, phosphorus, and potassium")
-                elif "pcos" in condition_lower:
-                    condition_guidelines.append("- PCOS: Low glycemic index, anti-inflammatory foods, balanced macros")
-                elif "thyroid" in condition_lower:
-                    condition_guidelines.append("- Thyroid: Iodine-rich foods, selenium, avoid goitrogens")
-                elif "cholesterol" in condition_lower:
-                    condition_guidelines.append("- High Cholesterol: Low saturated fat, high fiber, plant sterols")
-                elif "obesity" in condition_lower or "weight" in condition_lower:
-                    condition_guidelines.append("- Weight Management: Calorie control, portion sizes, nutrient density")
+                match = _CONDITION_RE.match(condition)
+                if match:
+                    condition_guidelines.append(_GUIDELINE_BY_TAG[match.lastgroup])
             
             if condition_guidelines:
                 condition_context += f"CONDITION-SPECIFIC GUIDELINES:\n" + "\n".join(condition_guidelines) + "\n"
@@ -2153,7 +2213,7 @@ Provide personalized health coaching that addresses their specific conditions an
 
         # Get AI response
         response = client.chat.completions.create(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+            model=AZURE_DEPLOYMENT,
             messages=[
                 {
                     "role": "system",
@@ -2240,13 +2300,12 @@ async def generate_meal_plan(
         print("/generate-meal-plan endpoint called")
         print(f"Current user: {current_user}")
         print(f"User profile received: {user_profile}")
-        print("Model:", os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"))
+        print("Model:", AZURE_DEPLOYMENT)
         print("Endpoint:", os.getenv("AZURE_OPENAI_ENDPOINT"))
         print("API Version:", os.getenv("AZURE_OPENAI_API_VERSION"))
 
         # If previous_meal_plan is provided, use it for 70/30 overlap
         def get_overlap_meals(prev_meals, new_meals):
-            import re
             if not prev_meals or not isinstance(prev_meals, list):
                 return new_meals
             overlap_count = int(0.7 * len(new_meals))
@@ -2923,7 +2982,6 @@ def consolidate_ingredients(recipes: List[dict]) -> List[dict]:
     """
     Consolidate ingredients from multiple recipes, combining quantities for duplicate items.
     """
-    import re
     ingredient_map = {}
     
     for recipe in recipes:
@@ -3185,7 +3243,7 @@ async def generate_shopping_list(
         print(prompt)
         # Call Azure OpenAI (synchronous call)
         response = client.chat.completions.create(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+            model=AZURE_DEPLOYMENT,
             messages=[
                 {"role": "system", "content": "You are a diabetes diet planning assistant."},
                 {"role": "user", "content": prompt}
@@ -3633,6 +3691,9 @@ async def delete_account(
             for shopping_list in shopping_lists:
                 interactions_container.delete_item(item=shopping_list, partition_key=shopping_list.get("session_id", user_email))
             
+            # Nothing derived from the deleted data may be served if the email registers again
+            invalidate_consumption_caches(user_email)
+            
             print(f"[PRIVACY_DELETE] Successfully deleted all data for user {user_email}")
             
         except Exception as e:
@@ -3719,7 +3780,6 @@ async def send_chat_message(
     try:
         recent_consumption = await get_user_consumption_history(current_user["id"], limit=200)
         # Filter to last 7 days
-        from datetime import datetime, timedelta
         seven_days_ago = datetime.utcnow() - timedelta(days=7)
         recent_consumption = [
             record for record in recent_consumption 
@@ -3740,14 +3800,15 @@ async def send_chat_message(
         print(f"Error filtering today's consumption: {e}")
         today_consumption = []
     
-    # Calculate today's nutritional totals
-    today_totals = {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}
+    # Calculate today's nutritional totals in locals, then build the dict once
+    calories = protein = carbs = fat = 0
     for record in today_consumption:
-        nutritional_info = record.get("nutritional_info", {})
-        today_totals["calories"] += nutritional_info.get("calories", 0)
-        today_totals["protein"] += nutritional_info.get("protein", 0)
-        today_totals["carbs"] += nutritional_info.get("carbohydrates", 0)
-        today_totals["fat"] += nutritional_info.get("fat", 0)
+        nutritional_info = record.get("nutritional_info") or _EMPTY_NUTRITION
+        calories += nutritional_info.get("calories", 0)
+        protein += nutritional_info.get("protein", 0)
+        carbs += nutritional_info.get("carbohydrates", 0)
+        fat += nutritional_info.get("fat", 0)
+    today_totals = {"calories": calories, "protein": protein, "carbs": carbs, "fat": fat}
     
     # Debug logging for today's consumption
     print(f"[CHAT_DEBUG] Found {len(today_consumption)} meals for today")
@@ -3875,7 +3936,7 @@ Remember: You have access to their complete meal planning and consumption histor
     
     # Generate response using OpenAI
     response = client.chat.completions.create(
-        model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+        model=AZURE_DEPLOYMENT,
         messages=[
             {"role": "system", "content": system_prompt},
             *formatted_chat_history,
@@ -4010,6 +4071,7 @@ async def save_user_profile(
             
             user_container.upsert_item(body=profile_record)
             print(f"Profile record upserted for user {current_user['email']}")
+            invalidate_profile_caches(current_user["email"])
             
         except Exception as db_error:
             print(f"Database error saving profile: {str(db_error)}")
@@ -4111,7 +4173,6 @@ async def save_user_recipes(request: FastAPIRequest, current_user: User = Depend
 @app.exception_handler(Exception)
 async def global_exception_handler(request: FastAPIRequest, exc: Exception):
     print(f"Global exception handler: {exc}", file=sys.stderr)
-    import traceback
     traceback.print_exc()
     return JSONResponse(
         status_code=500,
@@ -4148,6 +4209,7 @@ async def generate_plan(
         
         # Save the meal plan using Cosmos DB
         meal_plan = await save_meal_plan(current_user["email"], data)
+        invalidate_meal_plan_cache(current_user["email"])
         
         return {
             "status": "success",
@@ -4211,6 +4273,7 @@ async def delete_all_meal_plans_endpoint(
             raise HTTPException(status_code=400, detail="User ID not found in token. Please log in again.")
 
         deleted_count = await delete_all_user_meal_plans(user_id)
+        invalidate_meal_plan_cache(user_id)
 
         if deleted_count == 0:
             return {"message": "No meal plans were found to delete. Your history is already empty."}
@@ -4221,7 +4284,6 @@ async def delete_all_meal_plans_endpoint(
         raise
     except Exception as e:
         print(f"Error in DELETE /meal_plans/all: {e}")
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to delete all meal plans: {str(e)}")
 
@@ -4236,12 +4298,12 @@ async def delete_meal_plan(
         if not user_id:
              raise HTTPException(status_code=400, detail="User ID not found in token.")
         deleted = await delete_meal_plan_by_id(plan_id, user_id)
+        invalidate_meal_plan_cache(user_id)
         if not deleted:
              raise HTTPException(status_code=404, detail="Meal plan not found or does not belong to user.")
         return {"message": f"Meal plan '{plan_id}' deleted successfully"}
     except Exception as e:
         print(f"Error in DELETE /meal_plans/{{plan_id}}: {e}")
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to delete meal plan: {str(e)}")
 
@@ -4273,6 +4335,7 @@ async def bulk_delete_meal_plans(
                 plan_id = f'meal_plan_{plan_id}'
 
             deleted = await delete_meal_plan_by_id(plan_id, user_id)
+            invalidate_meal_plan_cache(user_id)
             
             if deleted:
                 deleted_count += 1
@@ -4514,6 +4577,7 @@ async def save_full_meal_plan_endpoint(
         # to ensure the basic meal plan fields are present.
 
         saved_plan = await save_meal_plan(user_id, full_meal_plan_data)
+        invalidate_meal_plan_cache(user_id)
         
         # You might want to return the saved_plan data or just a success message
         return {"message": "Meal plan saved successfully", "plan_id": saved_plan.get("id")}
@@ -4524,7 +4588,6 @@ async def save_full_meal_plan_endpoint(
     except Exception as e:
         # Handle other potential errors during saving
         print(f"Error saving full meal plan: {e}")
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="An error occurred while saving the meal plan.")
 
@@ -4542,7 +4605,6 @@ async def debug_meal_plans(current_user: User = Depends(get_current_user)):
         return {"meal_plans": items}
     except Exception as e:
         print(f"[DEBUG] Error in /debug/meal_plans: {e}")
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail="Internal server error")
 
@@ -4608,7 +4670,7 @@ async def analyze_and_record_food(
         
         # Generate structured analysis using OpenAI
         response = client.chat.completions.create(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+            model=AZURE_DEPLOYMENT,
             messages=[
                 {
                     "role": "system",
@@ -4663,12 +4725,8 @@ async def analyze_and_record_food(
         
         # Try to parse JSON from the response
         try:
-            import json
             # Extract JSON from response (in case there's additional text)
-            start_idx = analysis_text.find('{')
-            end_idx = analysis_text.rfind('}') + 1
-            json_str = analysis_text[start_idx:end_idx]
-            analysis_data = json.loads(json_str)
+            analysis_data = parse_json_object(analysis_text)
             print(f"[analyze_and_record_food] Successfully parsed analysis data: {analysis_data}")
         except (json.JSONDecodeError, ValueError) as e:
             print(f"[analyze_and_record_food] Error parsing analysis data: {str(e)}")
@@ -4710,6 +4768,7 @@ async def analyze_and_record_food(
         # Save to consumption history
         print(f"[analyze_and_record_food] Attempting to save consumption record for user {current_user['id']}")
         consumption_record = await save_consumption_record(current_user["email"], consumption_data, meal_type=meal_type or "")
+        invalidate_consumption_caches(current_user["email"])
         print(f"[analyze_and_record_food] Successfully saved consumption record with ID: {consumption_record['id']}")
         
         # Also save to chat if session_id is provided
@@ -4780,7 +4839,7 @@ async def get_consumption_analytics_endpoint(
         print(f"[get_consumption_analytics] Getting analytics for user {current_user['id']} for {days} days")
         
         # Use the original database function
-        analytics = await get_consumption_analytics(current_user["email"], days)
+        analytics = await get_cached_consumption_analytics(current_user["email"], days)
         print(f"[get_consumption_analytics] Generated analytics successfully")
         
         return analytics
@@ -4855,7 +4914,7 @@ async def analyze_image(
         
         # Generate response using OpenAI with image
         response = client.chat.completions.create(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+            model=AZURE_DEPLOYMENT,
             messages=[
                 {
                     "role": "system",
@@ -4918,39 +4977,51 @@ async def analyze_image(
         print(f"Error in image analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Helper for intent detection
-def has_logging_intent(message: str) -> bool:
-    logging_intents = [
+# Default meal type for each UTC hour when the user doesn't name one
+_HOUR_TO_MEAL = (
+    "snack", "snack", "snack", "snack", "snack",                      # 00-04
+    "breakfast", "breakfast", "breakfast", "breakfast", "breakfast", "breakfast",  # 05-10
+    "lunch", "lunch", "lunch", "lunch", "lunch",                      # 11-15
+    "dinner", "dinner", "dinner", "dinner", "dinner", "dinner",       # 16-21
+    "snack", "snack",                                                 # 22-23
+)
+
+# Intent / keyword patterns for the chat endpoint, compiled case-insensitively
+# so callers never need to lowercase the message first
+_LOG_INTENT_RE = re.compile(
+    "|".join(re.escape(kw) for kw in (
         "log this", "add this to my history", "record this", "save this",
         "log it", "add this meal", "add this food", "log meal", "log food",
         "can you log", "please log", "log as my", "this as my", "this was my"
-    ]
-    return any(kw in message.lower() for kw in logging_intents)
+    )),
+    flags=re.IGNORECASE,
+)
 
-# Add this helper near the top of the file
-import re
+_NUTRITION_PATTERNS = {
+    field: re.compile(rf"\b(?:{'|'.join(map(re.escape, keywords))})\b", flags=re.IGNORECASE)
+    for field, keywords in (
+        ('calories', ['calorie', 'calories', 'kcal']),
+        ('protein', ['protein', 'proteins']),
+        ('carbohydrates', ['carb', 'carbs', 'carbohydrate', 'carbohydrates']),
+        ('fat', ['fat', 'fats']),
+        ('fiber', ['fiber', 'fibre']),
+        ('sugar', ['sugar', 'sugars']),
+        ('sodium', ['sodium', 'salt']),
+    )
+}
+
+_MEAL_TYPE_RE = re.compile(r"\b(breakfast|lunch|dinner|snack)s?\b", flags=re.IGNORECASE)
+
+# Helper for intent detection
+def has_logging_intent(message: str) -> bool:
+    return _LOG_INTENT_RE.search(message) is not None
 
 def extract_nutrition_question(message: str):
     """
     Returns the nutrition field(s) the user is asking about, or None if not found.
     Supports: calories, protein, carbs, fat, fiber, sugar, sodium.
     """
-    nutrition_keywords = {
-        'calories': ['calorie', 'calories', 'kcal'],
-        'protein': ['protein', 'proteins'],
-        'carbohydrates': ['carb', 'carbs', 'carbohydrate', 'carbohydrates'],
-        'fat': ['fat', 'fats'],
-        'fiber': ['fiber', 'fibre'],
-        'sugar': ['sugar', 'sugars'],
-        'sodium': ['sodium', 'salt'],
-    }
-    found = []
-    msg = message.lower()
-    for field, keywords in nutrition_keywords.items():
-        for kw in keywords:
-            if re.search(rf'\b{re.escape(kw)}\b', msg):
-                found.append(field)
-                break
+    found = [field for field, pat in _NUTRITION_PATTERNS.items() if pat.search(message)]
     return found if found else None
 
 @app.post("/chat/message-with-image")
@@ -4976,27 +5047,26 @@ async def chat_message_with_image(
         meal_type = meal_type.strip().lower()
     else:
         # Fall back to parsing from message text
-        meal_type_match = re.search(r"\b(breakfast|lunch|dinner|snack)s?\b", message.lower())
+        meal_type_match = _MEAL_TYPE_RE.search(message)
         if meal_type_match:
-            meal_type = meal_type_match.group(1)
+            meal_type = meal_type_match.group(1).lower()
         else:
             # Auto-determine based on current time when not explicitly mentioned
-            current_hour = datetime.utcnow().hour
-            if 5 <= current_hour < 11:
-                meal_type = "breakfast"
-            elif 11 <= current_hour < 16:
-                meal_type = "lunch"
-            elif 16 <= current_hour < 22:
-                meal_type = "dinner"
-            else:
-                meal_type = "snack"
+            meal_type = _HOUR_TO_MEAL[datetime.utcnow().hour]
 
     # 🧠 GET COMPREHENSIVE USER CONTEXT - This is the key integration!
     try:
         user_context = await get_comprehensive_user_context(current_user["email"])
-        print(f"✅ Retrieved comprehensive context for user: {len(user_context.get('health_conditions', []))} conditions, {len(user_context.get('consumption_history', []))} recent meals")
+        if user_context is None:
+            raise ValueError("empty user context")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Retrieved comprehensive context for user: %d conditions, %d recent meals",
+                user_context["user_profile"]["total_medical_conditions"],
+                user_context["consumption_analysis"]["total_recent_meals"],
+            )
     except Exception as e:
-        print(f"❌ Error getting comprehensive context: {str(e)}")
+        logger.warning("Error getting comprehensive context: %s", e)
         user_context = {"error": "Could not retrieve user context"}
 
     # 🧠 CONTEXT RETRIEVAL - Get recent chat history for context
@@ -5066,13 +5136,18 @@ async def chat_message_with_image(
                             }
                             break
         except Exception as e:
-            print(f"Error retrieving context: {str(e)}")
+            logger.warning("Error retrieving context: %s", e)
 
     # If image is present, process it
     if image:
         contents = await image.read()
+        # Release the upload's spooled temp file as soon as we hold the bytes
+        await image.close()
         try:
             img = Image.open(BytesIO(contents))
+            # Force decode now so the raw upload bytes can be dropped
+            img.load()
+            contents = None
             if img.mode in ('RGBA', 'LA', 'P'):
                 background = Image.new('RGB', img.size, (255, 255, 255))
                 if img.mode == 'P':
@@ -5086,7 +5161,10 @@ async def chat_message_with_image(
                 img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
             buffered = BytesIO()
             img.save(buffered, format="JPEG", quality=85, optimize=True)
-            img_str = base64.b64encode(buffered.getvalue()).decode()
+            jpeg_bytes = buffered.getvalue()
+            buffered.close()
+            img.close()
+            img_str = base64.b64encode(jpeg_bytes).decode()
             image_url = img_str
         except Exception as img_error:
             raise HTTPException(status_code=400, detail="Invalid or corrupted image file.")
@@ -5152,7 +5230,7 @@ async def chat_message_with_image(
 
         # Generate structured analysis using OpenAI
         response = client.chat.completions.create(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+            model=AZURE_DEPLOYMENT,
             messages=[
                 {
                     "role": "system",
@@ -5179,11 +5257,7 @@ async def chat_message_with_image(
         )
         analysis_text = response.choices[0].message.content
         try:
-            import json
-            start_idx = analysis_text.find('{')
-            end_idx = analysis_text.rfind('}') + 1
-            json_str = analysis_text[start_idx:end_idx]
-            analysis_data = json.loads(json_str)
+            analysis_data = parse_json_object(analysis_text)
         except Exception:
             analysis_data = None
 
@@ -5226,14 +5300,15 @@ Would you like me to create a detailed recipe for any of these meal suggestions?
             "image_url": img_str
         }
         await save_consumption_record(current_user["email"], consumption_data, meal_type=meal_type)
+        invalidate_consumption_caches(current_user["email"])
 
         # Trigger meal plan recalibration after logging food
         try:
             profile = current_user.get("profile", {})
             await trigger_meal_plan_recalibration(current_user["email"], profile)
-            print(f"[chat_message_with_image] Meal plan recalibrated after food logging")
+            logger.debug("[chat_message_with_image] Meal plan recalibrated after food logging")
         except Exception as recal_error:
-            print(f"[chat_message_with_image] Error in meal plan recalibration: {recal_error}")
+            logger.warning("[chat_message_with_image] Error in meal plan recalibration: %s", recal_error)
 
         meal_type_text = f" as your **{meal_type}**" if meal_type else ""
         
@@ -5312,14 +5387,15 @@ Would you like me to log this to your consumption history? Just say "log this as
             "image_url": img_str if analysis_data else None
         }
         await save_consumption_record(current_user["email"], consumption_data, meal_type=meal_type)
+        invalidate_consumption_caches(current_user["email"])
 
         # Trigger meal plan recalibration after logging food
         try:
             profile = current_user.get("profile", {})
             await trigger_meal_plan_recalibration(current_user["email"], profile)
-            print(f"[chat_message_with_image] Meal plan recalibrated after legacy food logging")
+            logger.debug("[chat_message_with_image] Meal plan recalibrated after legacy food logging")
         except Exception as recal_error:
-            print(f"[chat_message_with_image] Error in meal plan recalibration: {recal_error}")
+            logger.warning("[chat_message_with_image] Error in meal plan recalibration: %s", recal_error)
 
         context_note = " (from previous analysis)" if recent_context and not analysis_data else ""
         meal_type_text = f" as your **{meal_type}**" if meal_type else ""
@@ -5375,12 +5451,10 @@ Your meal plan will be updated to reflect this logged meal."""
                 specific_data=specific_data
             )
             
-            print(f"✅ Generated comprehensive AI response for query type: {query_type}")
+            logger.debug("Generated comprehensive AI response for query type: %s", query_type)
 
-        except Exception as e:
-            print(f"❌ Error in comprehensive AI system: {str(e)}")
-            import traceback
-            print(f"Traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("Comprehensive AI system failure")
             
             # Fallback responses
             nutrition_fields = extract_nutrition_question(message)
@@ -5460,6 +5534,44 @@ How can I help you today?
 
     return StreamingResponse(_event_stream(), media_type="text/event-stream")
 
+@dataclass(frozen=True, slots=True)
+class Macros:
+    protein: int
+    carbohydrates: int
+    fat: int
+
+@dataclass(frozen=True, slots=True)
+class SmartDefaults:
+    calories: int
+    macronutrients: Macros
+
+# Goals used by /consumption/progress when neither the profile nor a meal plan has them
+SMART_DEFAULTS = SmartDefaults(calories=2000, macronutrients=Macros(protein=100, carbohydrates=250, fat=66))
+
+# Default macro goal in response shape, built once from SMART_DEFAULTS; read-only so it can be shared
+_DEFAULT_MACRO_GOAL = MappingProxyType({
+    "protein": SMART_DEFAULTS.macronutrients.protein,
+    "carbs": SMART_DEFAULTS.macronutrients.carbohydrates,
+    "fat": SMART_DEFAULTS.macronutrients.fat,
+})
+
+# (goal key, meal plan macronutrients key)
+_MACRO_KEY_MAP = (
+    ("protein", "protein"),
+    ("carbs", "carbs"),
+    ("fat", "fats"),
+)
+
+def parse_int(val, default):
+    """Coerce a stored goal value to int, accepting numbers and numeric strings like "1800.0" """
+    # bool is an int subclass; let it take the float route so a JSON true becomes 1 as before
+    if isinstance(val, int) and not isinstance(val, bool):
+        return val
+    try:
+        return int(float(val))
+    except (TypeError, ValueError, OverflowError):
+        return default
+
 @app.get("/consumption/progress")
 async def get_consumption_progress(current_user: User = Depends(get_current_user)):
     """
@@ -5479,32 +5591,17 @@ async def get_consumption_progress(current_user: User = Depends(get_current_user
         # Assume sorted by created_at DESC
         recent_meal_plan = meal_plans[0] if meal_plans else None
 
-    # Smart defaults
-    smart_defaults = {
-        "calories": 2000,
-        "macronutrients": {
-            "carbohydrates": 250,
-            "protein": 100,
-            "fat": 66
-        }
-    }
-
-    def parse_int(val, default):
-        try:
-            return int(val)
-        except Exception:
-            return default
-
     # 1. Try to get calorie goal from profile, then meal plan, then default
+    default_calories = SMART_DEFAULTS.calories
     calorie_goal = None
     if profile.get("calorieTarget"):
-        calorie_goal = parse_int(profile.get("calorieTarget"), smart_defaults["calories"])
+        calorie_goal = parse_int(profile.get("calorieTarget"), default_calories)
     elif profile.get("calories_target"):
-        calorie_goal = parse_int(profile.get("calories_target"), smart_defaults["calories"])
+        calorie_goal = parse_int(profile.get("calories_target"), default_calories)
     elif recent_meal_plan and recent_meal_plan.get("dailyCalories"):
-        calorie_goal = parse_int(recent_meal_plan.get("dailyCalories"), smart_defaults["calories"])
+        calorie_goal = parse_int(recent_meal_plan.get("dailyCalories"), default_calories)
     else:
-        calorie_goal = smart_defaults["calories"]
+        calorie_goal = default_calories
 
     # 2. Try to get macro goals from profile, then meal plan, then default
     macro_goals = profile.get("macroGoals")
@@ -5512,50 +5609,33 @@ async def get_consumption_progress(current_user: User = Depends(get_current_user
     macro_goal = None
     if macro_goals and isinstance(macro_goals, dict) and all(k in macro_goals for k in ["protein", "carbs", "fat"]):
         macro_goal = {
-            "protein": parse_int(macro_goals.get("protein"), smart_defaults["macronutrients"]["protein"]),
-            "carbs": parse_int(macro_goals.get("carbs"), smart_defaults["macronutrients"]["carbohydrates"]),
-            "fat": parse_int(macro_goals.get("fat"), smart_defaults["macronutrients"]["fat"])
+            goal_key: parse_int(macro_goals.get(goal_key), _DEFAULT_MACRO_GOAL[goal_key])
+            for goal_key, _ in _MACRO_KEY_MAP
         }
     elif macro_from_meal_plan and all(k in macro_from_meal_plan for k in ["protein", "carbs", "fats"]):
         macro_goal = {
-            "protein": parse_int(macro_from_meal_plan.get("protein"), smart_defaults["macronutrients"]["protein"]),
-            "carbs": parse_int(macro_from_meal_plan.get("carbs"), smart_defaults["macronutrients"]["carbohydrates"]),
-            "fat": parse_int(macro_from_meal_plan.get("fats"), smart_defaults["macronutrients"]["fat"])
+            goal_key: parse_int(macro_from_meal_plan.get(plan_key), _DEFAULT_MACRO_GOAL[goal_key])
+            for goal_key, plan_key in _MACRO_KEY_MAP
         }
     else:
-        macro_goal = {
-            "protein": smart_defaults["macronutrients"]["protein"],
-            "carbs": smart_defaults["macronutrients"]["carbohydrates"],
-            "fat": smart_defaults["macronutrients"]["fat"]
-        }
+        macro_goal = _DEFAULT_MACRO_GOAL
 
     # 3. (Future extensibility) Consider dietary info and physical activity for smarter defaults
     # For now, just use the above logic
 
-    # 4. Get today's consumption records - USE PROPER TIMEZONE-AWARE FILTERING
-    # Get today's consumption records using the new timezone-aware filtering
-    today_records = await get_today_consumption_records_async(current_user["email"], user_timezone="UTC")
-    
-    today_totals = {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}
-    for rec in today_records:
-        ni = rec.get("nutritional_info", {})
-        today_totals["calories"] += ni.get("calories", 0)
-        today_totals["protein"] += ni.get("protein", 0)
-        today_totals["carbs"] += ni.get("carbohydrates", 0)
-        today_totals["fat"] += ni.get("fat", 0)
+    # 4. Today's totals (TIMEZONE-AWARE BOUNDARIES) plus the weekly and monthly
+    # windows all come from one projected query over the last 30 days
+    now_utc = datetime.utcnow()
+    start_of_today_utc, start_of_tomorrow_utc = get_user_timezone_boundaries("UTC")
+    end_iso = start_of_tomorrow_utc.isoformat()
+    window_totals = await get_consumption_totals_by_window(current_user["email"], {
+        "today": (start_of_today_utc.isoformat(), end_iso),
+        "weekly": ((now_utc - timedelta(days=7)).isoformat(), end_iso),
+        "monthly": ((now_utc - timedelta(days=30)).isoformat(), end_iso),
+    })
 
-    # 5. Weekly and monthly averages (reuse analytics logic)
-    weekly = await get_consumption_analytics(current_user["email"], days=7)
-    monthly = await get_consumption_analytics(current_user["email"], days=30)
-
-    def macro_avg(analytics):
-        days = analytics.get("period_days", 1)
-        return {
-            "calories": round(analytics.get("total_calories", 0) / days, 1),
-            "protein": round(analytics.get("total_macronutrients", {}).get("protein", 0) / days, 1),
-            "carbs": round(analytics.get("total_macronutrients", {}).get("carbohydrates", 0) / days, 1),
-            "fat": round(analytics.get("total_macronutrients", {}).get("fat", 0) / days, 1),
-        }
+    def macro_avg(totals, days):
+        return {key: round(value / days, 1) for key, value in totals.items()}
 
     return {
         "goals": {
@@ -5564,105 +5644,290 @@ async def get_consumption_progress(current_user: User = Depends(get_current_user
             "carbs": macro_goal["carbs"],
             "fat": macro_goal["fat"]
         },
-        "today": today_totals,
-        "weekly_avg": macro_avg(weekly),
-        "monthly_avg": macro_avg(monthly)
+        "today": window_totals["today"],
+        "weekly_avg": macro_avg(window_totals["weekly"], 7),
+        "monthly_avg": macro_avg(window_totals["monthly"], 30)
     }
 
+# Streaks change at most once per day per user; entries are dropped when a meal is logged
+_streak_cache = TTLCache(maxsize=10000, ttl=3600)
+
+# Per-user analytics keyed by (user_email, UTC date), each holding {days: analytics}; invalidation
+# only reaches the worker that saved the record, so the short TTL bounds staleness in the others
+_analytics_cache = TTLCache(maxsize=20000, ttl=60)
+
+# Recent consumption records per user, each holding {limit: records}; short TTL for polling dashboards
+_recent_history_cache = TTLCache(maxsize=10000, ttl=60)
+
+# Record fields kept in the history cache; base64 images and analysis text are left out so
+# cached entries stay small
+_HISTORY_CACHE_FIELDS = ("timestamp", "meal_type", "nutritional_info", "medical_rating")
+
+# Daily insights payload keyed by (user_email, UTC date); dropped on profile edits, the short TTL bounds staleness from plan edits
+_insights_cache = TTLCache(maxsize=10000, ttl=60)
+
+# Today's meal plan response keyed by (user_email, UTC date); dropped whenever the user's profile, plans or consumption change
+_todays_plan_cache = TTLCache(maxsize=10000, ttl=60)
+
+# One lock per user so concurrent dashboard requests share a single today's-plan build;
+# bounded like the caches so idle users' locks are released
+_todays_plan_locks = TTLCache(maxsize=10000, ttl=600)
+
+def invalidate_consumption_caches(user_email: str):
+    """Drop cached per-user consumption derivatives after a new record is saved"""
+    key = (user_email, datetime.utcnow().date())
+    _streak_cache.pop(key, None)
+    _analytics_cache.pop(key, None)
+    _insights_cache.pop(key, None)
+    _recent_history_cache.pop(user_email, None)
+    invalidate_meal_plan_cache(user_email)
+
+def invalidate_profile_caches(user_email: str):
+    """Drop cached per-user payloads built from the profile after it is saved"""
+    _insights_cache.pop((user_email, datetime.utcnow().date()), None)
+    # Today's plan follows the profile's restrictions and allergies, so it must not outlive an edit
+    invalidate_meal_plan_cache(user_email)
+
+def invalidate_meal_plan_cache(user_email: str):
+    """Drop the cached today's meal plan after the user's saved plans change"""
+    _todays_plan_cache.pop((user_email, datetime.utcnow().date()), None)
+
+async def get_cached_consumption_analytics(user_email: str, days: int = 7) -> dict:
+    """get_consumption_analytics, reused for up to a minute or until the user logs a new meal"""
+    key = (user_email, datetime.utcnow().date())
+    by_days = _analytics_cache.get(key)
+    if by_days is None:
+        by_days = _analytics_cache[key] = {}
+    analytics = by_days.get(days)
+    if analytics is None:
+        analytics = by_days[days] = await get_consumption_analytics(user_email, days)
+    return analytics
+
+async def get_cached_consumption_history(user_email: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    get_user_consumption_history trimmed to _HISTORY_CACHE_FIELDS, reused for up to a minute
+    or until the user logs a new meal
+    """
+    by_limit = _recent_history_cache.get(user_email)
+    if by_limit is None:
+        by_limit = _recent_history_cache[user_email] = {}
+    history = by_limit.get(limit)
+    if history is None:
+        records = await get_user_consumption_history(user_email, limit=limit)
+        history = by_limit[limit] = [
+            {field: record[field] for field in _HISTORY_CACHE_FIELDS if field in record}
+            for record in records
+        ]
+    return history
+
+# Only the last 30 days can contribute to a consistency streak
+_STREAK_WINDOW_DAYS = 30
+
+async def get_consistency_streak(user_email: str) -> int:
+    """Consistency streak from the last 30 days of log dates, memoized for the rest of the UTC day"""
+    today = datetime.utcnow().date()
+    key = (user_email, today)
+    streak = _streak_cache.get(key)
+    if streak is None:
+        since = (today - timedelta(days=_STREAK_WINDOW_DAYS)).isoformat()
+        log_days = await get_consumption_log_days(user_email, since)
+        streak = _streak_cache[key] = _streak_from_log_days(log_days, today)
+        logger.debug("Calculated streak: %d days; today=%s log_entries=%d", streak, today, len(log_days))
+    return streak
+
 def calculate_consistency_streak(consumption_history: list) -> int:
     """Calculate consistency streak based on daily logging patterns"""
     if not consumption_history:
         return 0
+    # Timestamps are stored as UTC ISO strings, so the date is the leading YYYY-MM-DD
+    return _streak_from_log_days(
+        ((record.get("timestamp") or "")[:10] for record in consumption_history),
+        datetime.utcnow().date(),
+    )
+
+def _streak_from_log_days(log_days, today) -> int:
+    # A day qualifies once a second meal is seen for it; exact counts are never needed.
+    # ISO dates compare as strings, so days before the window are dropped up front
+    cutoff = (today - timedelta(days=_STREAK_WINDOW_DAYS - 1)).isoformat()
+    seen_days: set = set()
+    qualifying_days: set = set()
+    for day in log_days:
+        if not day or day < cutoff:
+            continue
+        if day in seen_days:
+            qualifying_days.add(day)
+        else:
+            seen_days.add(day)
     
-    from datetime import datetime, timedelta
-    
-    # Group consumption by date
-    daily_logs = {}
-    for record in consumption_history:
+    # Pack qualifying days into a bitmap, bit i = today - i days
+    bits = 0
+    for day in qualifying_days:
         try:
-            record_date = datetime.fromisoformat(record.get("timestamp", "").replace("Z", "+00:00")).date()
-            if record_date not in daily_logs:
-                daily_logs[record_date] = 0
-            daily_logs[record_date] += 1
-        except:
+            days_ago = (today - date.fromisoformat(day)).days
+        except (TypeError, ValueError):
             continue
+        if 0 <= days_ago < _STREAK_WINDOW_DAYS:
+            bits |= 1 << days_ago
     
-    # Calculate streak from today backwards
-    today = datetime.utcnow().date()
-    streak = 0
-    current_date = today
-    
-    # Check each day backwards
-    for i in range(30):  # Check last 30 days max
-        if current_date in daily_logs and daily_logs[current_date] >= 2:  # At least 2 meals logged
-            streak += 1
-        else:
-            break  # Streak broken
-        current_date -= timedelta(days=1)
-    
-    return streak
+    return streak_from_bitmap(bits)
+
+def streak_from_bitmap(bits: int) -> int:
+    """Count consecutive logged days from today backwards in a day bitmap (bit 0 = today).
+
+    Works on plain ints so batch jobs can build one bitmap per user and reuse it.
+    The count is a single int.bit_length() call, so it is already native code
+    without a compiled extension.
+    """
+    # Isolate the lowest clear bit; its position is the run length of trailing ones
+    return ((~bits) & (bits + 1)).bit_length() - 1
+
+# Score points per meal share: high carb (>45g), high sugar (>15g), high sodium (>800mg), healthy choice
+_HEALTH_SCORE_ADJUSTMENTS = (
+    ("high_carb_meals", -15),
+    ("high_sugar_meals", -20),
+    ("processed_foods", -10),
+    ("healthy_choices", 10),
+)
 
-@app.get("/coach/daily-insights")
+# Suitability rating -> (score factor, credit toward the suitable-meal share); medium earns partial credit
+_SUITABILITY_SCORING = {
+    "high": ("high_suitability", 1),
+    "medium": ("medium_suitability", 0.7),
+}
+_LOW_SUITABILITY = ("low_suitability", 0)
+
+@app.get("/coach/daily-insights", response_class=ORJSONResponse)
 async def get_daily_coaching_insights(current_user: User = Depends(get_current_user)):
     """Get daily insights - USING ORIGINAL LOGIC with better integration"""
     try:
-        print(f"[get_daily_insights] Getting insights for user {current_user['email']}")
+        logger.debug("[get_daily_insights] Getting insights for user %s", current_user["email"])
+        
+        # Read the clock once; the 7-day window, today's boundaries and the hour all derive from it
+        now_utc = datetime.utcnow()
+        
+        # Dashboard polls within the same minute reuse the last payload until a meal is logged
+        cache_key = (current_user["email"], now_utc.date())
+        cached_insights = _insights_cache.get(cache_key)
+        if cached_insights is not None:
+            return cached_insights
         
         # Get user profile
         profile = current_user.get("profile", {})
         
+        # Meal plans and consumption history are independent queries, so run them concurrently;
+        # failures come back as results and each keeps its own fallback below
+        meal_plans_result, consumption_result = await asyncio.gather(
+            get_user_meal_plans(current_user["email"], limit=3),
+            get_cached_consumption_history(current_user["email"], limit=30),
+            return_exceptions=True,
+        )
+        
         # Get recent meal plans
         try:
-            recent_meal_plans = await get_user_meal_plans(current_user["email"])
-            recent_meal_plans = recent_meal_plans[:3]
+            if isinstance(meal_plans_result, BaseException):
+                raise meal_plans_result
+            recent_meal_plans = meal_plans_result[:3]
         except Exception as e:
-            print(f"Error fetching meal plans for coaching insights: {e}")
+            logger.warning("Error fetching meal plans for coaching insights: %s", e)
             recent_meal_plans = []
         
         # Get recent consumption history (last 7 days) - USING ORIGINAL FUNCTION
         try:
-            recent_consumption = await get_user_consumption_history(current_user["email"], limit=30)
-            from datetime import datetime, timedelta
-            seven_days_ago = datetime.utcnow() - timedelta(days=7)
-            recent_consumption = [
-                record for record in recent_consumption 
-                if datetime.fromisoformat(record.get("timestamp", "").replace("Z", "+00:00")) > seven_days_ago
-            ]
+            if isinstance(consumption_result, BaseException):
+                raise consumption_result
+            recent_consumption = consumption_result
+            seven_days_ago = now_utc - timedelta(days=7)
+            # Parse each timestamp once and keep it aligned with its record for the today filter
+            recent_timestamps = []
+            recent_records = []
+            for record in recent_consumption:
+                record_timestamp = parse_record_timestamp(record)
+                if record_timestamp is not None and record_timestamp > seven_days_ago:
+                    recent_records.append(record)
+                    recent_timestamps.append(record_timestamp)
+            recent_consumption = recent_records
         except Exception as e:
-            print(f"Error fetching consumption history for coaching insights: {e}")
+            logger.warning("Error fetching consumption history for coaching insights: %s", e)
             recent_consumption = []
-        
-        # Get today's consumption with proper timezone-aware filtering
-        # Use the new timezone-aware filtering function that resets at midnight
-        today_consumption = filter_today_records(recent_consumption, user_timezone="UTC")
+            recent_timestamps = []
         
         # Get today's UTC date for response
-        today_utc = datetime.utcnow().date()
+        today_utc = now_utc.date()
+        start_of_today_utc, start_of_tomorrow_utc = get_today_utc_boundaries(now_utc)
+        
+        # One pass over the week scores every record and collects today's records and totals,
+        # which are a subset of the same list
+        today_consumption = []
+        today_totals = {"calories": 0, "protein": 0, "carbohydrates": 0, "fat": 0, "fiber": 0, "sugar": 0, "sodium": 0}
         
-        # Debug the filtering
-        print(f"[DEBUG] Today's consumption filter: Found {len(today_consumption)} records for today")
-        print(f"[DEBUG] Using timezone-aware filtering with proper midnight reset (timezone: UTC)")
+        # Enhanced diabetes score calculation based on multiple factors
+        condition_suitable_count = 0
+        total_recent_records = len(recent_consumption)
+        weekly_calories = 0
         
-        # DEBUG: Print filtering results
-        print(f"[DEBUG] Recent consumption has {len(recent_consumption)} records")
-        print(f"[DEBUG] Filtered to {len(today_consumption)} records for today")
+        # Get user's health conditions
+        user_conditions = get_medical_conditions(profile)
         
-        # Calculate today's totals - USING CONSISTENT FIELD NAMES
-        # THIS IS THE ACTUAL TODAY'S TOTAL, NOT AVERAGES
-        today_totals = {"calories": 0, "protein": 0, "carbohydrates": 0, "fat": 0, "fiber": 0, "sugar": 0, "sodium": 0}
-        for record in today_consumption:
-            nutritional_info = record.get("nutritional_info", {})
-            today_totals["calories"] += nutritional_info.get("calories", 0)
-            today_totals["protein"] += nutritional_info.get("protein", 0)
-            today_totals["carbohydrates"] += nutritional_info.get("carbohydrates", nutritional_info.get("carbs", 0))  # Handle both field names
-            today_totals["fat"] += nutritional_info.get("fat", 0)
-            today_totals["fiber"] += nutritional_info.get("fiber", 0)
-            today_totals["sugar"] += nutritional_info.get("sugar", 0)
-            today_totals["sodium"] += nutritional_info.get("sodium", 0)
+        # Enhanced scoring factors
+        diabetes_score_factors = {
+            "high_suitability": 0,
+            "medium_suitability": 0,
+            "low_suitability": 0,
+            "high_carb_meals": 0,
+            "high_sugar_meals": 0,
+            "processed_foods": 0,
+            "healthy_choices": 0
+        }
+        high_carb_meals = high_sugar_meals = processed_foods = healthy_choices = 0
         
-        # DEBUG: Print what we calculated
-        print(f"[DEBUG] Calculated today's totals: {today_totals}")
-        print(f"[DEBUG] Based on {len(today_consumption)} records from today only")
+        for record, record_timestamp in zip(recent_consumption, recent_timestamps):
+            # Access nutritional info properly; each value is read once and shared by
+            # the weekly score and today's totals
+            nutritional_info = record.get("nutritional_info", {})
+            calories = nutritional_info.get("calories", 0)
+            carbs = nutritional_info.get("carbohydrates", 0)
+            sugar = nutritional_info.get("sugar", 0)
+            fiber = nutritional_info.get("fiber", 0)
+            sodium = nutritional_info.get("sodium", 0)
+            weekly_calories += calories
+            
+            # Today's totals (midnight reset in UTC); carbs accept both field names
+            if start_of_today_utc <= record_timestamp < start_of_tomorrow_utc:
+                today_consumption.append(record)
+                today_totals["calories"] += calories
+                today_totals["protein"] += nutritional_info.get("protein", 0)
+                today_totals["carbohydrates"] += carbs if "carbohydrates" in nutritional_info else nutritional_info.get("carbs", 0)
+                today_totals["fat"] += nutritional_info.get("fat", 0)
+                today_totals["fiber"] += fiber
+                today_totals["sugar"] += sugar
+                today_totals["sodium"] += sodium
+            
+            # Check medical rating
+            medical_rating = record.get("medical_rating", {})
+            diabetes_suitability = medical_rating.get("diabetes_suitability", "medium").lower()
+            
+            # Score based on diabetes suitability
+            suitability_factor, suitability_credit = _SUITABILITY_SCORING.get(diabetes_suitability, _LOW_SUITABILITY)
+            diabetes_score_factors[suitability_factor] += 1
+            condition_suitable_count += suitability_credit
+            
+            # Threshold checks add their bool straight into the counts instead of branching:
+            # high carb (>45g), high sugar (>15g), high sodium (>800mg), healthy (fiber + low GI).
+            # The glycemic rating is only lowercased for the high-fiber meals that need it
+            high_carb_meals += carbs > 45
+            high_sugar_meals += sugar > 15
+            processed_foods += sodium > 800
+            healthy_choices += fiber >= 5 and medical_rating.get("glycemic_impact", "medium").lower() == "low"
+        
+        diabetes_score_factors["high_carb_meals"] = high_carb_meals
+        diabetes_score_factors["high_sugar_meals"] = high_sugar_meals
+        diabetes_score_factors["processed_foods"] = processed_foods
+        diabetes_score_factors["healthy_choices"] = healthy_choices
+        
+        logger.debug(
+            "[get_daily_insights] %d recent records, %d from today (timezone: UTC)",
+            len(recent_consumption), len(today_consumption),
+        )
         
         # Get goals
         calorie_goal = 2000
@@ -5694,78 +5959,17 @@ async def get_daily_coaching_insights(current_user: User = Depends(get_current_u
             "fat": min(100, (today_totals["fat"] / macro_goals["fat"] * 100)) if macro_goals["fat"] > 0 else 0
         }
         
-        # Enhanced diabetes score calculation based on multiple factors
-        condition_suitable_count = 0
-        total_recent_records = len(recent_consumption)
-        weekly_calories = 0
-        
-        # Get user's health conditions
-        user_conditions = profile.get("medicalConditions", []) or profile.get("medical_conditions", [])
-        
-        # Enhanced scoring factors
-        diabetes_score_factors = {
-            "high_suitability": 0,
-            "medium_suitability": 0,
-            "low_suitability": 0,
-            "high_carb_meals": 0,
-            "high_sugar_meals": 0,
-            "processed_foods": 0,
-            "healthy_choices": 0
-        }
-        
-        for record in recent_consumption:
-            # Access nutritional info properly
-            nutritional_info = record.get("nutritional_info", {})
-            weekly_calories += nutritional_info.get("calories", 0)
-            
-            # Get nutritional values
-            carbs = nutritional_info.get("carbohydrates", 0)
-            sugar = nutritional_info.get("sugar", 0)
-            fiber = nutritional_info.get("fiber", 0)
-            sodium = nutritional_info.get("sodium", 0)
-            
-            # Check medical rating
-            medical_rating = record.get("medical_rating", {})
-            diabetes_suitability = medical_rating.get("diabetes_suitability", "medium").lower()
-            glycemic_impact = medical_rating.get("glycemic_impact", "medium").lower()
-            
-            # Score based on diabetes suitability
-            if diabetes_suitability == "high":
-                diabetes_score_factors["high_suitability"] += 1
-                condition_suitable_count += 1
-            elif diabetes_suitability == "medium":
-                diabetes_score_factors["medium_suitability"] += 1
-                condition_suitable_count += 0.7  # Partial credit
-            else:
-                diabetes_score_factors["low_suitability"] += 1
-            
-            # Penalize high carb meals (>45g carbs per meal)
-            if carbs > 45:
-                diabetes_score_factors["high_carb_meals"] += 1
-            
-            # Penalize high sugar meals (>15g sugar per meal)
-            if sugar > 15:
-                diabetes_score_factors["high_sugar_meals"] += 1
-            
-            # Penalize high sodium (>800mg per meal)
-            if sodium > 800:
-                diabetes_score_factors["processed_foods"] += 1
-            
-            # Reward healthy choices (high fiber, low glycemic)
-            if fiber >= 5 and glycemic_impact == "low":
-                diabetes_score_factors["healthy_choices"] += 1
-        
         # Calculate enhanced diabetes score
         if total_recent_records > 0:
             base_score = (condition_suitable_count / total_recent_records * 100)
             
-            # Apply penalties and bonuses
-            carb_penalty = (diabetes_score_factors["high_carb_meals"] / total_recent_records) * 15
-            sugar_penalty = (diabetes_score_factors["high_sugar_meals"] / total_recent_records) * 20
-            processed_penalty = (diabetes_score_factors["processed_foods"] / total_recent_records) * 10
-            healthy_bonus = (diabetes_score_factors["healthy_choices"] / total_recent_records) * 10
+            # Apply penalties and bonuses, each scaled by the share of meals it applies to
+            adjustment = sum(
+                diabetes_score_factors[factor] * weight
+                for factor, weight in _HEALTH_SCORE_ADJUSTMENTS
+            ) / total_recent_records
             
-            health_adherence = max(0, min(100, base_score - carb_penalty - sugar_penalty - processed_penalty + healthy_bonus))
+            health_adherence = max(0, min(100, base_score + adjustment))
         else:
             # Default score for new users - show 0 until they have data
             health_adherence = 0
@@ -5773,31 +5977,22 @@ async def get_daily_coaching_insights(current_user: User = Depends(get_current_u
         # Generate coaching recommendations with better logic
         recommendations = []
         
-        # Debug logging
-        print(f"[DEBUG] today_totals: {today_totals}")
-        print(f"[DEBUG] adherence: {adherence}")
-        print(f"[DEBUG] calorie_goal: {calorie_goal}, macro_goals: {macro_goals}")
-        
-        # Enhanced Debug logging for troubleshooting
-        print(f"[DEBUG] Raw today_totals: {today_totals}")
-        print(f"[DEBUG] Raw adherence: {adherence}")
-        print(f"[DEBUG] Raw calorie_goal: {calorie_goal}")
-        print(f"[DEBUG] Raw macro_goals: {macro_goals}")
-        print(f"[DEBUG] Today consumption records count: {len(today_consumption)}")
-        print(f"[DEBUG] Recent consumption records count: {len(recent_consumption)}")
-        
-        # Additional debugging for consumption data
+        # Arguments are only formatted when DEBUG is enabled
+        logger.debug(
+            "[get_daily_insights] today_totals=%s adherence=%s calorie_goal=%s macro_goals=%s",
+            today_totals, adherence, calorie_goal, macro_goals,
+        )
         if today_consumption:
-            print(f"[DEBUG] Sample today consumption record: {today_consumption[0]}")
+            logger.debug("[get_daily_insights] Sample today consumption record: %s", today_consumption[0])
         
         # Calorie recommendations - fix logic by using raw percentage instead of capped adherence
         raw_calorie_adherence_pct = (today_totals["calories"] / calorie_goal * 100) if calorie_goal > 0 else 0
         remaining_calories = calorie_goal - today_totals["calories"]
         
-        # Debug the calculation
-        print(f"[DEBUG] Calorie calculation: {calorie_goal} - {today_totals['calories']} = {remaining_calories}")
-        print(f"[DEBUG] Raw calorie adherence: {raw_calorie_adherence_pct}%")
-        print(f"[DEBUG] Capped calorie adherence: {adherence['calories']}%")
+        logger.debug(
+            "[get_daily_insights] remaining calories %s, raw adherence %s%%, capped %s%%",
+            remaining_calories, raw_calorie_adherence_pct, adherence["calories"],
+        )
         
         if raw_calorie_adherence_pct < 70:  # Less than 70% of goal
             if remaining_calories > 0:  # Only show if actually below goal
@@ -5828,9 +6023,10 @@ async def get_daily_coaching_insights(current_user: User = Depends(get_current_u
         protein_adherence_pct = adherence["protein"]
         protein_needed = macro_goals["protein"] - today_totals["protein"]
         
-        # Debug the protein calculation
-        print(f"[DEBUG] Protein calculation: {macro_goals['protein']} - {today_totals['protein']} = {protein_needed}")
-        print(f"[DEBUG] Protein adherence: {protein_adherence_pct}%")
+        logger.debug(
+            "[get_daily_insights] protein needed %s, adherence %s%%",
+            protein_needed, protein_adherence_pct,
+        )
         
         if protein_adherence_pct < 80:  # Less than 80% of goal
             if protein_needed > 0:  # Only show if actually need more protein
@@ -5859,10 +6055,11 @@ async def get_daily_coaching_insights(current_user: User = Depends(get_current_u
             })
         
         # Check for breakfast - only if it's past 10 AM and no breakfast logged
-        current_hour = datetime.utcnow().hour
-        has_breakfast = any(record.get("meal_type", "").lower() == "breakfast" for record in today_consumption)
-        
-        if current_hour >= 10 and not has_breakfast and len(today_consumption) > 0:
+        # The meal-type scan runs last so mornings and empty days skip it
+        current_hour = now_utc.hour
+        if current_hour >= 10 and today_consumption and not any(
+            record.get("meal_type", "").lower() == "breakfast" for record in today_consumption
+        ):
             # Only show if they have other meals but no breakfast
             recommendations.append({
                 "type": "breakfast_reminder",
@@ -5907,6 +6104,50 @@ async def get_daily_coaching_insights(current_user: User = Depends(get_current_u
         # Limit to top 4 most relevant recommendations
         recommendations = unique_recommendations[:4]
         
+        # A streak has to include today with at least two meals, and today's records are the
+        # newest in the history already loaded, so fewer than two here means no streak
+        if len(today_consumption) < 2:
+            consistency_streak = 0
+        else:
+            try:
+                consistency_streak = await get_consistency_streak(current_user["email"])
+            except Exception as e:
+                logger.warning("Error computing consistency streak: %s", e)
+                consistency_streak = 0
+        
+        # Insight cards for the frontend; only the set for the current state is built
+        meals_logged_today = len(today_consumption)
+        if meals_logged_today > 0:
+            # The first two conditions, as quoted in the insight messages
+            conditions_preview = ', '.join(user_conditions[:2])
+            conditions_suffix = '...' if len(user_conditions) > 2 else ''
+            adherence_text = f"{health_adherence:.0f}"
+            insight_cards = [
+                {
+                    "category": "Daily Progress",
+                    "message": f"You've logged {meals_logged_today} meals today with {adherence_text}% health-suitable choices for your conditions: {conditions_preview}{conditions_suffix}.",
+                    "action": "View Details"
+                },
+                {
+                    "category": "Weekly Trend", 
+                    "message": f"This week you've maintained {total_recent_records} meal logs with consistent tracking for your health management.",
+                    "action": "Keep Going"
+                },
+                {
+                    "category": "Health Focus",
+                    "message": f"Your meal choices are {adherence_text}% aligned with recommendations for {conditions_preview}.",
+                    "action": "Get Recommendations"
+                }
+            ]
+        else:
+            insight_cards = [
+                {
+                    "category": "Getting Started",
+                    "message": f"Start logging your meals to get personalized AI insights for your health conditions: {', '.join(user_conditions)}!",
+                    "action": "Log First Meal"
+                }
+            ]
+        
         insights = {
             "date": today_utc.isoformat(),
             "goals": {
@@ -5918,54 +6159,147 @@ async def get_daily_coaching_insights(current_user: User = Depends(get_current_u
             "today_totals": today_totals,
             "adherence": adherence,
             "diabetes_adherence": health_adherence,  # Now represents overall health adherence
-            "health_adherence": health_adherence,  # Add explicit health adherence field
             "health_conditions": user_conditions,  # Add user's health conditions
-            "consistency_streak": calculate_consistency_streak(recent_consumption),
-            "meals_logged_today": len(today_consumption),
+            "consistency_streak": consistency_streak,
+            "meals_logged_today": meals_logged_today,
             "weekly_stats": {
                 "total_meals": total_recent_records,
                 "diabetes_suitable_percentage": health_adherence,  # Now represents overall health adherence
-                "health_suitable_percentage": health_adherence,
                 "average_daily_calories": weekly_calories / 7 if weekly_calories > 0 else 0
             },
             "recommendations": recommendations,
             "has_meal_plan": len(recent_meal_plans) > 0,
             "latest_meal_plan_date": recent_meal_plans[0].get("created_at") if recent_meal_plans else None,
             # Add insights for the frontend
-            "insights": [
-                {
-                    "category": "Daily Progress",
-                    "message": f"You've logged {len(today_consumption)} meals today with {health_adherence:.0f}% health-suitable choices for your conditions: {', '.join(user_conditions[:2])}{'...' if len(user_conditions) > 2 else ''}.",
-                    "action": "View Details"
-                },
-                {
-                    "category": "Weekly Trend", 
-                    "message": f"This week you've maintained {total_recent_records} meal logs with consistent tracking for your health management.",
-                    "action": "Keep Going"
-                },
-                {
-                    "category": "Health Focus",
-                    "message": f"Your meal choices are {health_adherence:.0f}% aligned with recommendations for {', '.join(user_conditions[:2])}.",
-                    "action": "Get Recommendations"
-                }
-            ] if len(today_consumption) > 0 else [
-                {
-                    "category": "Getting Started",
-                    "message": f"Start logging your meals to get personalized AI insights for your health conditions: {', '.join(user_conditions)}!",
-                    "action": "Log First Meal"
-                }
-            ]
+            "insights": insight_cards
         }
         
-        print(f"[get_daily_insights] Generated insights successfully")
-        
+        _insights_cache[cache_key] = insights
         return insights
         
     except Exception as e:
-        print(f"[get_daily_insights] Error: {str(e)}")
-        print(f"[get_daily_insights] Traceback: {traceback.format_exc()}")
+        logger.exception("[get_daily_insights] Error: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to get daily insights: {str(e)}")
 
+def dietary_flags(dietary_restrictions: List[str], allergies: List[str], diet_type: List[str]) -> Tuple[bool, bool, bool]:
+    """
+    (is_vegetarian, no_eggs, nut_allergy) for a profile.
+    Each profile list is lowercased once; vegetarian must be an exact entry,
+    egg and nut match as substrings of any entry.
+    """
+    restrictions_lower = [str(r).lower() for r in dietary_restrictions]
+    # The separator keeps a keyword from matching across two entries
+    restrictions_text = " | ".join(restrictions_lower)
+    allergies_text = " | ".join(str(a).lower() for a in allergies)
+    
+    is_vegetarian = 'vegetarian' in restrictions_lower or any(str(d).lower() == 'vegetarian' for d in diet_type)
+    no_eggs = 'egg' in restrictions_text or 'egg' in allergies_text
+    return is_vegetarian, no_eggs, 'nut' in allergies_text
+
+def build_restriction_warnings(dietary_restrictions: List[str], allergies: List[str], diet_type: List[str]) -> List[str]:
+    """Explicit dietary warnings for meal-generation prompts"""
+    is_vegetarian, no_eggs, nut_allergy = dietary_flags(dietary_restrictions, allergies, diet_type)
+    
+    warnings = []
+    if is_vegetarian:
+        warnings.append("STRICTLY VEGETARIAN - NO MEAT, POULTRY, FISH, OR SEAFOOD")
+    if no_eggs:
+        warnings.append("NO EGGS - Avoid all egg-based dishes and ingredients")
+    if nut_allergy:
+        warnings.append("NUT ALLERGY - Avoid all nuts and nut-based products")
+    return warnings
+
+# Simple post-log meal suggestions, as (remaining calories must exceed, suggestions) from the largest tier down
+_POST_LOG_MEAL_SUGGESTIONS = (
+    (1500, MappingProxyType({
+        "breakfast": "Steel-cut oats with almond milk, berries, and nuts",
+        "lunch": "Mediterranean quinoa salad with chickpeas and vegetables",
+        "dinner": "Lentil curry with brown rice and steamed vegetables",
+        "snack": "Apple slices with almond butter"
+    })),
+    (800, MappingProxyType({
+        "breakfast": "Greek yogurt with berries and granola",
+        "lunch": "Vegetable soup with whole grain bread",
+        "dinner": "Grilled vegetables with quinoa",
+        "snack": "Mixed nuts and dried fruit"
+    })),
+    (float("-inf"), MappingProxyType({
+        "breakfast": "Smoothie with spinach, banana, and almond milk",
+        "lunch": "Green salad with chickpeas and olive oil",
+        "dinner": "Steamed vegetables with hummus",
+        "snack": "Carrot sticks with hummus"
+    })),
+)
+
+def post_log_meal_suggestions(remaining_calories: float) -> MappingProxyType:
+    """Meal suggestions for the rest of the day, picked by how many calories remain"""
+    for threshold, suggestions in _POST_LOG_MEAL_SUGGESTIONS:
+        if remaining_calories > threshold:
+            return suggestions
+    return _POST_LOG_MEAL_SUGGESTIONS[-1][1]
+
+# Parsed quick-log AI analyses as orjson bytes, keyed by normalized (food_name, portion);
+# repeat logs of the same food skip the OpenAI round trip
+_quick_log_analysis_cache = TTLCache(maxsize=5000, ttl=7 * 24 * 3600)
+
+def quick_log_analysis_key(food_name: str, portion: str) -> tuple:
+    """Cache key for a quick-log analysis, ignoring case and surrounding whitespace"""
+    return (food_name.strip().lower(), portion.strip().lower())
+
+# Nutrition-analysis prompt for a quick-logged food; braces in the JSON skeleton are doubled for str.format
+_QUICK_LOG_PROMPT = """
+Analyze the food item: {food_name} ({portion})
+
+Provide a comprehensive JSON response with this exact structure:
+{{
+    "food_name": "{food_name}",
+    "estimated_portion": "{portion}",
+    "nutritional_info": {{
+        "calories": <number>,
+        "carbohydrates": <number>,
+        "protein": <number>,
+        "fat": <number>,
+        "fiber": <number>,
+        "sugar": <number>,
+        "sodium": <number>
+    }},
+    "medical_rating": {{
+        "diabetes_suitability": "high/medium/low",
+        "glycemic_impact": "low/medium/high",
+        "recommended_frequency": "daily/weekly/occasional/avoid",
+        "portion_recommendation": "appropriate/reduce/increase"
+    }},
+    "analysis_notes": "Brief explanation of nutritional value and diabetes considerations"
+}}
+
+Base estimates on standard nutritional databases. Be accurate and conservative with diabetes ratings.
+Only return valid JSON, no other text.
+""".strip()
+
+# Conservative per-item estimates for quick logs the AI could not analyze; copied per request
+_QUICK_LOG_FALLBACK_NUTRITION = MappingProxyType({
+    "calories": 200,
+    "carbohydrates": 25,
+    "protein": 10,
+    "fat": 8,
+    "fiber": 3,
+    "sugar": 5,
+    "sodium": 300
+})
+_QUICK_LOG_FALLBACK_RATING = MappingProxyType({
+    "diabetes_suitability": "medium",
+    "glycemic_impact": "medium",
+    "recommended_frequency": "weekly",
+    "portion_recommendation": "appropriate"
+})
+
+# Quick logs that move remaining calories by at most this much since the last replan,
+# within the same meal, keep today's plan instead of rebuilding it
+QUICK_LOG_REPLAN_THRESHOLD_KCAL = 150
+
+# (remaining_calories, meal_type) at each user's last quick-log replan, keyed by (user_email, UTC date)
+_quick_log_replan_state = TTLCache(maxsize=10000, ttl=24 * 3600)
+
 @app.post("/coach/quick-log")
 async def quick_log_food(
     food_data: dict,
@@ -5973,8 +6307,8 @@ async def quick_log_food(
 ):
     """Quick log food - USING ORIGINAL SAVE FUNCTION with better AI analysis"""
     try:
-        print(f"[quick_log_food] Starting quick log for user {current_user['id']}")
-        print(f"[quick_log_food] Food data received: {food_data}")
+        logger.debug("[quick_log_food] Starting quick log for user %s", current_user["id"])
+        logger.debug("[quick_log_food] Food data received: %s", food_data)
         
         food_name = food_data.get("food_name", "").strip()
         portion = food_data.get("portion", "medium portion").strip()
@@ -5982,94 +6316,57 @@ async def quick_log_food(
         if not food_name:
             raise HTTPException(status_code=400, detail="Food name is required")
         
-        # Use AI to estimate nutritional values with comprehensive analysis
-        prompt = f"""
-        Analyze the food item: {food_name} ({portion})
-        
-        Provide a comprehensive JSON response with this exact structure:
-        {{
-            "food_name": "{food_name}",
-            "estimated_portion": "{portion}",
-            "nutritional_info": {{
-                "calories": <number>,
-                "carbohydrates": <number>,
-                "protein": <number>,
-                "fat": <number>,
-                "fiber": <number>,
-                "sugar": <number>,
-                "sodium": <number>
-            }},
-            "medical_rating": {{
-                "diabetes_suitability": "high/medium/low",
-                "glycemic_impact": "low/medium/high",
-                "recommended_frequency": "daily/weekly/occasional/avoid",
-                "portion_recommendation": "appropriate/reduce/increase"
-            }},
-            "analysis_notes": "Brief explanation of nutritional value and diabetes considerations"
-        }}
-        
-        Base estimates on standard nutritional databases. Be accurate and conservative with diabetes ratings.
-        Only return valid JSON, no other text.
-        """
-        
-        # Initialize fallback data
+        # Estimates used when the AI analysis is unavailable or unparseable
         fallback_data = {
             "food_name": food_name,
             "estimated_portion": portion,
-            "nutritional_info": {
-                "calories": 200,
-                "carbohydrates": 25,
-                "protein": 10,
-                "fat": 8,
-                "fiber": 3,
-                "sugar": 5,
-                "sodium": 300
-            },
-            "medical_rating": {
-                "diabetes_suitability": "medium",
-                "glycemic_impact": "medium",
-                "recommended_frequency": "weekly",
-                "portion_recommendation": "appropriate"
-            },
+            "nutritional_info": dict(_QUICK_LOG_FALLBACK_NUTRITION),
+            "medical_rating": dict(_QUICK_LOG_FALLBACK_RATING),
             "analysis_notes": f"Nutritional estimate for {food_name}. Consult with healthcare provider for personalized advice."
         }
         
-        try:
-            print("[quick_log_food] Calling OpenAI for nutritional analysis")
-            response = client.chat.completions.create(
-                model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a nutrition analysis expert specializing in diabetes management. Provide accurate nutritional estimates and diabetes-appropriate recommendations."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
-                max_tokens=500,
-                temperature=0.3
-            )
+        analysis_key = quick_log_analysis_key(food_name, portion)
+        cached_analysis = _quick_log_analysis_cache.get(analysis_key)
+        if cached_analysis is not None:
+            logger.debug("[quick_log_food] Using cached nutritional analysis")
+            analysis_data = orjson.loads(cached_analysis)
+        else:
+            try:
+                # Use AI to estimate nutritional values with comprehensive analysis
+                prompt = _QUICK_LOG_PROMPT.format(food_name=food_name, portion=portion)
+                logger.debug("[quick_log_food] Calling OpenAI for nutritional analysis")
+                response = client.chat.completions.create(
+                    model=AZURE_DEPLOYMENT,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a nutrition analysis expert specializing in diabetes management. Provide accurate nutritional estimates and diabetes-appropriate recommendations."
+                        },
+                        {
+                            "role": "user", 
+                            "content": prompt
+                        }
+                    ],
+                    max_tokens=500,
+                    temperature=0.3
+                )
             
-            # Parse AI response
-            analysis_text = response.choices[0].message.content
-            print(f"[quick_log_food] OpenAI response: {analysis_text}")
+                # Parse AI response
+                analysis_text = response.choices[0].message.content
+                logger.debug("[quick_log_food] OpenAI response: %s", analysis_text)
             
-            try:
-                # Extract JSON from response
-                start_idx = analysis_text.find('{')
-                end_idx = analysis_text.rfind('}') + 1
-                json_str = analysis_text[start_idx:end_idx]
-                analysis_data = json.loads(json_str)
-                print(f"[quick_log_food] Successfully parsed AI analysis: {analysis_data}")
-            except (json.JSONDecodeError, ValueError) as parse_error:
-                print(f"[quick_log_food] JSON parsing error: {str(parse_error)}")
-                analysis_data = fallback_data
+                try:
+                    # Extract JSON from response
+                    analysis_data = parse_json_object(analysis_text)
+                    logger.debug("[quick_log_food] Successfully parsed AI analysis: %s", analysis_data)
+                    _quick_log_analysis_cache[analysis_key] = orjson.dumps(analysis_data)
+                except (json.JSONDecodeError, ValueError) as parse_error:
+                    logger.warning("[quick_log_food] JSON parsing error: %s", parse_error)
+                    analysis_data = fallback_data
                 
-        except Exception as openai_error:
-            print(f"[quick_log_food] OpenAI API error: {str(openai_error)}. Using fallback estimation.")
-            analysis_data = fallback_data
+            except Exception as openai_error:
+                logger.warning("[quick_log_food] OpenAI API error: %s. Using fallback estimation.", openai_error)
+                analysis_data = fallback_data
         
         # Determine meal type based on provided value or current time
         provided_meal_type = food_data.get("meal_type", "").strip().lower()
@@ -6081,29 +6378,11 @@ async def quick_log_food(
             user_profile = current_user.get("profile", {})
             user_timezone = user_profile.get("timezone", "UTC")
             
-            try:
-                import pytz
-                from datetime import datetime
-                
-                # Convert UTC time to user's local time
-                utc_time = datetime.utcnow()
-                user_tz = pytz.timezone(user_timezone)
-                local_time = utc_time.replace(tzinfo=pytz.utc).astimezone(user_tz)
-                current_hour = local_time.hour
-            except:
-                # Fallback to UTC if timezone conversion fails
-                current_hour = datetime.utcnow().hour
-            
-            if 5 <= current_hour < 11:
-                meal_type = "breakfast"
-            elif 11 <= current_hour < 16:
-                meal_type = "lunch"
-            elif 16 <= current_hour < 22:
-                meal_type = "dinner"
-            else:
-                meal_type = "snack"
+            # Current hour in the user's local time (unknown zones resolve to UTC), mapped
+            # through the same hour table the chat logger uses
+            meal_type = _HOUR_TO_MEAL[datetime.now(tz=get_zoneinfo(user_timezone)).hour]
         
-        print(f"[quick_log_food] Determined meal type: {meal_type}")
+        logger.debug("[quick_log_food] Determined meal type: %s", meal_type)
         
         # Prepare consumption data in the same format as the image analysis system
         consumption_data = {
@@ -6116,28 +6395,36 @@ async def quick_log_food(
             "meal_type": meal_type
         }
         
-        print(f"[quick_log_food] Prepared consumption data: {consumption_data}")
+        logger.debug("[quick_log_food] Prepared consumption data: %s", consumption_data)
         
         # Save to consumption history using the ORIGINAL save function
-        print(f"[quick_log_food] Saving consumption record for user {current_user['email']}")
+        logger.debug("[quick_log_food] Saving consumption record for user %s", current_user["email"])
         consumption_record = await save_consumption_record(current_user["email"], consumption_data, meal_type=meal_type)
-        print(f"[quick_log_food] Successfully saved consumption record with ID: {consumption_record['id']}")
+        invalidate_consumption_caches(current_user["email"])
+        logger.debug("[quick_log_food] Successfully saved consumption record with ID: %s", consumption_record["id"])
         
         # ------------------------------
         # SIMPLIFIED MEAL PLAN REGENERATION AFTER EVERY LOG
         # ------------------------------
+        # Today's records and their calorie sum are computed once here and handed to the recalibration below
+        today_consumption = None
+        calories_consumed = None
+        # Target-based remaining calories; the replan gate compares this quantity across logs
+        remaining_calories = None
+        replan_key = (current_user["email"], datetime.utcnow().date())
+        replan = True
         try:
-            print("[quick_log_food] Starting meal plan regeneration after food log...")
+            logger.debug("[quick_log_food] Starting meal plan regeneration after food log...")
             
             # Get today's consumption including the new log - USE PROPER TIMEZONE-AWARE FILTERING
             consumption_data_full = await get_user_consumption_history(current_user["email"], limit=100)
             today_consumption = filter_today_records(consumption_data_full, user_timezone="UTC")
             
-            print(f"[quick_log_food] Found {len(today_consumption)} consumption records for today")
+            logger.debug("[quick_log_food] Found %d consumption records for today", len(today_consumption))
             
             # Calculate calories consumed so far
             calories_consumed = sum(r.get("nutritional_info", {}).get("calories", 0) for r in today_consumption)
-            print(f"[quick_log_food] Total calories consumed today: {calories_consumed}")
+            logger.debug("[quick_log_food] Total calories consumed today: %s", calories_consumed)
             
             # Get user profile for dietary restrictions
             profile = current_user.get("profile", {})
@@ -6147,147 +6434,131 @@ async def quick_log_food(
             target_calories = int(profile.get('calorieTarget', '2000'))
             remaining_calories = max(0, target_calories - calories_consumed)
             
-            print(f"[quick_log_food] Target calories: {target_calories}, Remaining: {remaining_calories}")
-            print(f"[quick_log_food] Dietary restrictions: {dietary_restrictions}")
-            print(f"[quick_log_food] Allergies: {allergies}")
-            print(f"[quick_log_food] Diet type: {diet_type}")
-            
-            # Build explicit restriction warnings for AI
-            restriction_warnings = []
-            if 'vegetarian' in [r.lower() for r in dietary_restrictions] or 'vegetarian' in [d.lower() for d in diet_type]:
-                restriction_warnings.append("STRICTLY VEGETARIAN - NO MEAT, POULTRY, FISH, OR SEAFOOD")
-            if any('egg' in r.lower() for r in dietary_restrictions) or any('egg' in a.lower() for a in allergies):
-                restriction_warnings.append("NO EGGS - Avoid all egg-based dishes and ingredients")
-            if any('nut' in a.lower() for a in allergies):
-                restriction_warnings.append("NUT ALLERGY - Avoid all nuts and nut-based products")
-            
-            restriction_text = "\n".join([f"⚠️ {warning}" for warning in restriction_warnings])
-            
-            # Create a simple updated meal plan with better format consistency
-            print(f"[quick_log_food] Creating updated meal plan with remaining calories: {remaining_calories}")
-            
-            # Generate simple meal suggestions based on remaining calories
-            def get_meal_suggestion(meal_type: str, remaining_cals: int) -> str:
-                """Get a simple meal suggestion based on remaining calories"""
-                if remaining_cals > 1500:
-                    suggestions = {
-                        "breakfast": "Steel-cut oats with almond milk, berries, and nuts",
-                        "lunch": "Mediterranean quinoa salad with chickpeas and vegetables",
-                        "dinner": "Lentil curry with brown rice and steamed vegetables",
-                        "snack": "Apple slices with almond butter"
-                    }
-                elif remaining_cals > 800:
-                    suggestions = {
-                        "breakfast": "Greek yogurt with berries and granola",
-                        "lunch": "Vegetable soup with whole grain bread",
-                        "dinner": "Grilled vegetables with quinoa",
-                        "snack": "Mixed nuts and dried fruit"
-                    }
-                else:
-                    suggestions = {
-                        "breakfast": "Smoothie with spinach, banana, and almond milk",
-                        "lunch": "Green salad with chickpeas and olive oil",
-                        "dinner": "Steamed vegetables with hummus",
-                        "snack": "Carrot sticks with hummus"
-                    }
-                
-                return suggestions.get(meal_type, "Healthy vegetarian meal")
-            
-            # Create simple meal plan
-            updated_meals = {
-                "breakfast": get_meal_suggestion("breakfast", remaining_calories),
-                "lunch": get_meal_suggestion("lunch", remaining_calories),
-                "dinner": get_meal_suggestion("dinner", remaining_calories),
-                "snacks": get_meal_suggestion("snack", remaining_calories)
-            }
+            logger.debug(
+                "[quick_log_food] Target calories: %s, Remaining: %s; restrictions=%s allergies=%s diet type=%s",
+                target_calories, remaining_calories, dietary_restrictions, allergies, diet_type,
+            )
             
-            # Create the meal plan in the format expected by the frontend
-            today = datetime.utcnow().date()
-            new_plan = {
-                "id": f"updated_{current_user['email']}_{today.isoformat()}_{int(datetime.utcnow().timestamp())}",
-                "date": today.isoformat(),
-                "type": "post_log_update",
-                "meals": updated_meals,
-                "dailyCalories": target_calories,
-                "calories_consumed": calories_consumed,
-                "calories_remaining": remaining_calories,
-                "created_at": datetime.utcnow().isoformat(),
-                "notes": f"Updated after logging food. {remaining_calories} calories remaining for today."
-            }
+            # Small logs within the same meal keep today's plan and skip the recalibration below
+            previous_replan = _quick_log_replan_state.get(replan_key)
+            replan = (
+                previous_replan is None
+                or previous_replan[1] != meal_type
+                or abs(previous_replan[0] - remaining_calories) > QUICK_LOG_REPLAN_THRESHOLD_KCAL
+            )
+            if not replan:
+                logger.debug(
+                    "[quick_log_food] Keeping today's plan; remaining calories within %d kcal of the last replan",
+                    QUICK_LOG_REPLAN_THRESHOLD_KCAL,
+                )
+            else:
+                # Build explicit restriction warnings for AI
+                restriction_warnings = build_restriction_warnings(dietary_restrictions, allergies, diet_type)
             
-            print(f"[quick_log_food] Created meal plan: {new_plan}")
+                restriction_text = "\n".join([f"⚠️ {warning}" for warning in restriction_warnings])
             
-            # Try to save the meal plan
-            try:
-                await save_meal_plan(current_user["email"], new_plan)
-                print(f"[quick_log_food] Successfully saved updated meal plan with remaining calories: {remaining_calories}")
-            except ValueError as validation_err:
-                print(f"[quick_log_food] Validation error saving meal plan: {validation_err}")
-            except Exception as save_err:
-                print(f"[quick_log_food] Error saving meal plan: {save_err}")
-                import traceback
-                print(traceback.format_exc())
+                # Create a simple updated meal plan with better format consistency
+                logger.debug("[quick_log_food] Creating updated meal plan with remaining calories: %s", remaining_calories)
+            
+                # Create simple meal plan from the suggestion tier for the remaining calories
+                suggestions = post_log_meal_suggestions(remaining_calories)
+                updated_meals = {
+                    "breakfast": suggestions["breakfast"],
+                    "lunch": suggestions["lunch"],
+                    "dinner": suggestions["dinner"],
+                    "snacks": suggestions["snack"]
+                }
+            
+                # Create the meal plan in the format expected by the frontend; date, id and created_at share one timestamp
+                now = datetime.utcnow()
+                today = now.date()
+                new_plan = {
+                    "id": f"updated_{current_user['email']}_{today.isoformat()}_{int(now.timestamp())}",
+                    "date": today.isoformat(),
+                    "type": "post_log_update",
+                    "meals": updated_meals,
+                    "dailyCalories": target_calories,
+                    "calories_consumed": calories_consumed,
+                    "calories_remaining": remaining_calories,
+                    "created_at": now.isoformat(),
+                    "notes": f"Updated after logging food. {remaining_calories} calories remaining for today."
+                }
+            
+                logger.debug("[quick_log_food] Created meal plan: %s", new_plan)
+            
+                # Try to save the meal plan
+                try:
+                    await save_meal_plan(current_user["email"], new_plan)
+                    invalidate_meal_plan_cache(current_user["email"])
+                    logger.debug("[quick_log_food] Successfully saved updated meal plan with remaining calories: %s", remaining_calories)
+                except ValueError as validation_err:
+                    logger.warning("[quick_log_food] Validation error saving meal plan: %s", validation_err)
+                except Exception as save_err:
+                    logger.exception("[quick_log_food] Error saving meal plan: %s", save_err)
                 
         except Exception as plan_err:
-            print(f"[quick_log_food] Failed to update meal plan: {plan_err}")
-            import traceback
-            print(traceback.format_exc())
+            logger.exception("[quick_log_food] Failed to update meal plan: %s", plan_err)
+        
+        logged_response = {
+            "success": True,
+            "message": f"Successfully logged {analysis_data.get('food_name', food_name)}",
+            "consumption_record_id": consumption_record["id"],
+            "analysis": analysis_data,
+            "food_name": analysis_data.get("food_name", food_name),
+            "nutritional_summary": {
+                "calories": analysis_data.get("nutritional_info", {}).get("calories", 0),
+                "carbohydrates": analysis_data.get("nutritional_info", {}).get("carbohydrates", 0),
+                "protein": analysis_data.get("nutritional_info", {}).get("protein", 0),
+                "fat": analysis_data.get("nutritional_info", {}).get("fat", 0)
+            },
+            "diabetes_rating": analysis_data.get("medical_rating", {}).get("diabetes_suitability", "medium"),
+        }
+        
+        if not replan:
+            return {
+                **logged_response,
+                "meal_plan_updated": False,
+                "remaining_calories": remaining_calories,
+                "calibration_applied": False,
+                "note": "Food logged successfully; today's meal plan still fits the remaining calories"
+            }
         
         # ------------------------------
         # TRIGGER COMPREHENSIVE MEAL PLAN RECALIBRATION
         # ------------------------------
         try:
-            print("[quick_log_food] Triggering comprehensive meal plan recalibration...")
+            logger.debug("[quick_log_food] Triggering comprehensive meal plan recalibration...")
             
             # Use the new recalibration system
             profile = current_user.get("profile", {})
-            updated_plan = await trigger_meal_plan_recalibration(current_user["email"], profile)
+            updated_plan = await trigger_meal_plan_recalibration(
+                current_user["email"], profile,
+                today_consumption=today_consumption, calories_consumed=calories_consumed,
+            )
             
             if updated_plan:
-                print(f"[quick_log_food] Meal plan recalibration completed successfully")
+                logger.debug("[quick_log_food] Meal plan recalibration completed successfully")
+                if remaining_calories is not None:
+                    _quick_log_replan_state[replan_key] = (remaining_calories, meal_type)
                 remaining_calories = updated_plan.get("remaining_calories", 0)
                 
                 # Return success response with meal plan update status
                 return {
-                    "success": True,
-                    "message": f"Successfully logged {analysis_data.get('food_name', food_name)}",
-                    "consumption_record_id": consumption_record["id"],
-                    "analysis": analysis_data,
-                    "food_name": analysis_data.get("food_name", food_name),
-                    "nutritional_summary": {
-                        "calories": analysis_data.get("nutritional_info", {}).get("calories", 0),
-                        "carbohydrates": analysis_data.get("nutritional_info", {}).get("carbohydrates", 0),
-                        "protein": analysis_data.get("nutritional_info", {}).get("protein", 0),
-                        "fat": analysis_data.get("nutritional_info", {}).get("fat", 0)
-                    },
-                    "diabetes_rating": analysis_data.get("medical_rating", {}).get("diabetes_suitability", "medium"),
+                    **logged_response,
                     "meal_plan_updated": True,
                     "remaining_calories": remaining_calories,
                     "updated_meal_plan": updated_plan,
                     "calibration_applied": True
                 }
             else:
-                print(f"[quick_log_food] Meal plan recalibration failed, but continuing...")
+                logger.warning("[quick_log_food] Meal plan recalibration failed, but continuing...")
                 
         except Exception as e:
-            print(f"[quick_log_food] Error in meal plan recalibration: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
+            logger.exception("[quick_log_food] Error in meal plan recalibration: %s", e)
             
         # Fallback response if recalibration fails
         return {
-            "success": True,
-            "message": f"Successfully logged {analysis_data.get('food_name', food_name)}",
-            "consumption_record_id": consumption_record["id"],
-            "analysis": analysis_data,
-            "food_name": analysis_data.get("food_name", food_name),
-            "nutritional_summary": {
-                "calories": analysis_data.get("nutritional_info", {}).get("calories", 0),
-                "carbohydrates": analysis_data.get("nutritional_info", {}).get("carbohydrates", 0),
-                "protein": analysis_data.get("nutritional_info", {}).get("protein", 0),
-                "fat": analysis_data.get("nutritional_info", {}).get("fat", 0)
-            },
-            "diabetes_rating": analysis_data.get("medical_rating", {}).get("diabetes_suitability", "medium"),
+            **logged_response,
             "meal_plan_updated": False,
             "calibration_applied": False,
             "note": "Food logged successfully but meal plan update failed"
@@ -6297,10 +6568,27 @@ async def quick_log_food(
         # Re-raise HTTP exceptions as-is
         raise
     except Exception as e:
-        print(f"[quick_log_food] Unexpected error: {str(e)}")
-        print(f"[quick_log_food] Full error details:", traceback.format_exc())
+        logger.exception("[quick_log_food] Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to log food item: {str(e)}")
 
+# Words of three or more letters; connectives are dropped so "rice and beans" doesn't match "eggs and toast"
+_MEAL_WORD_RE = re.compile(r"[a-z]{3,}")
+_MEAL_STOPWORDS = frozenset({"and", "with", "the", "for", "recommended"})
+
+def _singular_meal_word(word: str) -> str:
+    """Fold common English plurals so "2 eggs" matches "Boiled egg" and "berries" matches "berry"."""
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def meal_name_tokens(text: str) -> frozenset:
+    """Lowercased, singularised content words of a meal or food name, for adherence matching."""
+    return frozenset(_singular_meal_word(word) for word in _MEAL_WORD_RE.findall(text.lower()) if word not in _MEAL_STOPWORDS)
+
 async def analyze_consumption_vs_plan(consumption_records: list, meal_plan: dict) -> dict:
     """
     Analyze what was actually consumed vs. what was planned.
@@ -6334,6 +6622,10 @@ async def analyze_consumption_vs_plan(consumption_records: list, meal_plan: dict
         # Process each consumption record
         diabetes_suitable_count = 0
         total_records = len(consumption_records)
+        nutritional_totals = analysis["nutritional_totals"]
+        # Bound appends per meal bucket; unrecognised meal types are filed as snacks
+        meal_appenders = {meal: consumed.append for meal, consumed in analysis["meals_consumed"].items()}
+        append_snack = meal_appenders["snack"]
         
         for record in consumption_records:
             meal_type = record.get("meal_type", "snack")
@@ -6342,7 +6634,7 @@ async def analyze_consumption_vs_plan(consumption_records: list, meal_plan: dict
             medical_rating = record.get("medical_rating", {})
             
             # Add to consumed meals
-            analysis["meals_consumed"][meal_type].append({
+            meal_appenders.get(meal_type, append_snack)({
                 "food_name": food_name,
                 "nutritional_info": nutritional_info,
                 "medical_rating": medical_rating,
@@ -6350,12 +6642,8 @@ async def analyze_consumption_vs_plan(consumption_records: list, meal_plan: dict
             })
             
             # Add to nutritional totals
-            analysis["nutritional_totals"]["calories"] += nutritional_info.get("calories", 0)
-            analysis["nutritional_totals"]["protein"] += nutritional_info.get("protein", 0)
-            analysis["nutritional_totals"]["carbohydrates"] += nutritional_info.get("carbohydrates", 0)
-            analysis["nutritional_totals"]["fat"] += nutritional_info.get("fat", 0)
-            analysis["nutritional_totals"]["fiber"] += nutritional_info.get("fiber", 0)
-            analysis["nutritional_totals"]["sugar"] += nutritional_info.get("sugar", 0)
+            for nutrient in nutritional_totals:
+                nutritional_totals[nutrient] += nutritional_info.get(nutrient, 0)
             
             # Check diabetes suitability
             diabetes_suitability = medical_rating.get("diabetes_suitability", "").lower()
@@ -6363,7 +6651,7 @@ async def analyze_consumption_vs_plan(consumption_records: list, meal_plan: dict
                 diabetes_suitable_count += 1
         
         # Calculate overall metrics
-        analysis["total_calories_consumed"] = analysis["nutritional_totals"]["calories"]
+        analysis["total_calories_consumed"] = nutritional_totals["calories"]
         analysis["diabetes_suitability_score"] = (diabetes_suitable_count / total_records * 100) if total_records > 0 else 0
         
         # Analyze adherence by meal type
@@ -6372,10 +6660,10 @@ async def analyze_consumption_vs_plan(consumption_records: list, meal_plan: dict
             if consumed_meals:
                 # Check if consumed meals match planned meals (basic text matching)
                 consumed_names = [meal["food_name"].lower() for meal in consumed_meals]
-                planned_lower = planned_meal.lower()
+                planned_tokens = meal_name_tokens(planned_meal)
                 
-                # Simple matching logic - can be enhanced
-                adherence = "followed" if any(name in planned_lower or planned_lower in name for name in consumed_names) else "deviated"
+                # A meal counts as followed when any consumed food shares a word with the plan
+                adherence = "deviated" if all(planned_tokens.isdisjoint(meal_name_tokens(name)) for name in consumed_names) else "followed"
                 analysis["adherence_by_meal"][meal_type] = {
                     "status": adherence,
                     "consumed": consumed_names,
@@ -6386,7 +6674,7 @@ async def analyze_consumption_vs_plan(consumption_records: list, meal_plan: dict
         return analysis
         
     except Exception as e:
-        print(f"[analyze_consumption_vs_plan] Error: {e}")
+        logger.exception("[analyze_consumption_vs_plan] Error: %s", e)
         return {
             "total_calories_consumed": 0,
             "total_calories_planned": 2000,
@@ -6399,28 +6687,18 @@ async def analyze_consumption_vs_plan(consumption_records: list, meal_plan: dict
         }
 
 
-def get_remaining_meals_by_time(current_hour: int) -> list:
+def _meals_remaining_at(hour: int) -> Tuple[str, ...]:
+    # Breakfast until 11 AM, lunch until 4 PM, dinner until 10 PM; snacks are always available
+    return tuple(meal for meal, ends in (("breakfast", 11), ("lunch", 16), ("dinner", 22)) if hour < ends) + ("snack",)
+
+# Meals still ahead for each hour of the day, built once at import
+_REMAINING_MEALS_BY_HOUR = tuple(_meals_remaining_at(hour) for hour in range(24))
+
+def get_remaining_meals_by_time(current_hour: int) -> Tuple[str, ...]:
     """
     Determine which meals are remaining based on current time.
     """
-    remaining_meals = []
-    
-    # Breakfast: 5 AM - 11 AM
-    if current_hour < 11:
-        remaining_meals.append("breakfast")
-    
-    # Lunch: 11 AM - 4 PM
-    if current_hour < 16:
-        remaining_meals.append("lunch")
-    
-    # Dinner: 4 PM - 10 PM
-    if current_hour < 22:
-        remaining_meals.append("dinner")
-    
-    # Snack: Always available
-    remaining_meals.append("snack")
-    
-    return remaining_meals
+    return _REMAINING_MEALS_BY_HOUR[current_hour]
 
 
 async def apply_intelligent_adaptations(meal_plan: dict, consumption_analysis: dict, remaining_meals: list, user_profile: dict) -> dict:
@@ -6432,6 +6710,48 @@ async def apply_intelligent_adaptations(meal_plan: dict, consumption_analysis: d
     return meal_plan
 
 
+# Keywords marking an alternative as unsuitable for a restriction or allergy
+_ALTERNATIVE_TAG_KEYWORDS = (
+    ("meat", ("chicken", "salmon", "fish", "meat")),
+    ("nut", ("nut", "almond")),
+    ("egg", ("omelet", "egg")),
+)
+
+def _alternative_tags(option: str) -> frozenset:
+    option_lower = option.lower()
+    return frozenset(tag for tag, keywords in _ALTERNATIVE_TAG_KEYWORDS if any(k in option_lower for k in keywords))
+
+# Simple diabetes-friendly alternatives per meal type, each as (option, tags) tagged once at import
+_DIABETES_FRIENDLY_ALTERNATIVES = {
+    meal_type: tuple((option, _alternative_tags(option)) for option in options)
+    for meal_type, options in {
+        "breakfast": (
+            "Steel-cut oats with almond milk and fresh berries",
+            "Vegetable omelet with spinach and bell peppers",
+            "Greek yogurt with chia seeds and nuts",
+            "Whole grain toast with avocado"
+        ),
+        "lunch": (
+            "Quinoa Buddha bowl with roasted vegetables",
+            "Lentil soup with mixed greens salad",
+            "Grilled chicken salad with olive oil dressing",
+            "Vegetable stir-fry with brown rice"
+        ),
+        "dinner": (
+            "Baked salmon with steamed broccoli and quinoa",
+            "Lentil curry with cauliflower rice",
+            "Grilled chicken with roasted vegetables",
+            "Vegetable curry with chickpeas"
+        ),
+        "snack": (
+            "Apple slices with almond butter",
+            "Cucumber slices with hummus",
+            "Handful of mixed nuts",
+            "Greek yogurt with cinnamon"
+        ),
+    }.items()
+}
+
 async def generate_diabetes_friendly_alternative(current_meal: str, meal_type: str, user_profile: dict) -> str:
     """
     Generate a diabetes-friendly alternative to the current meal.
@@ -6441,48 +6761,20 @@ async def generate_diabetes_friendly_alternative(current_meal: str, meal_type: s
         dietary_restrictions = user_profile.get('dietaryRestrictions', [])
         allergies = user_profile.get('allergies', [])
         
-        # Simple diabetes-friendly alternatives
-        diabetes_friendly_options = {
-            "breakfast": [
-                "Steel-cut oats with almond milk and fresh berries",
-                "Vegetable omelet with spinach and bell peppers",
-                "Greek yogurt with chia seeds and nuts",
-                "Whole grain toast with avocado"
-            ],
-            "lunch": [
-                "Quinoa Buddha bowl with roasted vegetables",
-                "Lentil soup with mixed greens salad",
-                "Grilled chicken salad with olive oil dressing",
-                "Vegetable stir-fry with brown rice"
-            ],
-            "dinner": [
-                "Baked salmon with steamed broccoli and quinoa",
-                "Lentil curry with cauliflower rice",
-                "Grilled chicken with roasted vegetables",
-                "Vegetable curry with chickpeas"
-            ],
-            "snack": [
-                "Apple slices with almond butter",
-                "Cucumber slices with hummus",
-                "Handful of mixed nuts",
-                "Greek yogurt with cinnamon"
-            ]
-        }
-        
-        # Filter options based on dietary restrictions
-        options = diabetes_friendly_options.get(meal_type, [])
-        
-        # Simple filtering for vegetarian
-        if 'vegetarian' in [r.lower() for r in dietary_restrictions]:
-            options = [opt for opt in options if not any(meat in opt.lower() for meat in ['chicken', 'salmon', 'fish', 'meat'])]
-        
-        # Filter for allergies
-        if allergies:
-            for allergy in allergies:
-                if 'nut' in allergy.lower():
-                    options = [opt for opt in options if 'nut' not in opt.lower() and 'almond' not in opt.lower()]
-                if 'egg' in allergy.lower():
-                    options = [opt for opt in options if 'omelet' not in opt.lower() and 'egg' not in opt.lower()]
+        # Drop options carrying a tag the profile rules out
+        excluded = set()
+        if 'vegetarian' in [str(r).lower() for r in dietary_restrictions]:
+            excluded.add("meat")
+        for allergy in allergies:
+            allergy_lower = str(allergy).lower()
+            if 'nut' in allergy_lower:
+                excluded.add("nut")
+            if 'egg' in allergy_lower:
+                excluded.add("egg")
+        options = [
+            option for option, tags in _DIABETES_FRIENDLY_ALTERNATIVES.get(meal_type, ())
+            if tags.isdisjoint(excluded)
+        ]
         
         # Return first suitable option
         return options[0] if options else current_meal
@@ -6492,43 +6784,87 @@ async def generate_diabetes_friendly_alternative(current_meal: str, meal_type: s
         return current_meal
 
 
+# Generic wording left in meal slots that still need concrete dishes; "_" catches template slugs
+_PLACEHOLDER_MEAL_RE = re.compile(r"healthy|balanced|nutritious|option|_", re.IGNORECASE)
+
+# Safety filter for AI-generated concrete meals: keywords that make a dish non-vegetarian or
+# egg-based ("egg" also covers eggs and fried egg, "omelet" covers omelette), and their replacements
+_NON_VEGETARIAN_MEAL_RE = re.compile(r"chicken|beef|pork|fish|salmon|tuna|turkey|lamb|meat|seafood|shrimp", re.IGNORECASE)
+_EGG_MEAL_RE = re.compile(r"egg|omelet|scrambled|poached", re.IGNORECASE)
+_VEGETARIAN_REPLACEMENT_MEAL = "Vegetarian lentil and vegetable curry with quinoa"
+_EGG_FREE_REPLACEMENT_MEAL = "Overnight oats with almond milk, chia seeds, and fresh berries"
+
+def sanitize_generated_meal(meal_text: str) -> str:
+    """Ensure an AI-generated meal is vegetarian and egg-free"""
+    if _NON_VEGETARIAN_MEAL_RE.search(meal_text):
+        return _VEGETARIAN_REPLACEMENT_MEAL
+    if _EGG_MEAL_RE.search(meal_text):
+        return _EGG_FREE_REPLACEMENT_MEAL
+    return meal_text
+
+# Runs of repeated " (recommended)" tags and "Recommended:" prefixes, each collapsed to one in a single substitution
+_DUP_REC_TAG = re.compile(r"(?: \(recommended\)){2,}")
+_DUP_REC_PREFIX = re.compile(r"(?:[Rr]ecommended:\s*){2,}")
+
 @app.get("/coach/todays-meal-plan")
 async def get_todays_meal_plan(current_user: User = Depends(get_current_user)):
     """
     Get today's adaptive meal plan based on recent consumption and health conditions.
+    Served from a per-user cache for up to a minute; concurrent requests for the same
+    user wait for a single build instead of each regenerating the plan.
+    """
+    cache_key = (current_user["email"], datetime.utcnow().date())
+    todays_plan = _todays_plan_cache.get(cache_key)
+    if todays_plan is not None:
+        return todays_plan
+    lock = _todays_plan_locks.get(current_user["email"])
+    if lock is None:
+        lock = _todays_plan_locks[current_user["email"]] = asyncio.Lock()
+    async with lock:
+        todays_plan = _todays_plan_cache.get(cache_key)
+        if todays_plan is None:
+            todays_plan = _todays_plan_cache[cache_key] = await build_todays_meal_plan(current_user)
+    return todays_plan
+
+async def build_todays_meal_plan(current_user: dict) -> dict:
+    """
+    Build today's adaptive meal plan.
     Returns the most recent meal plan or creates a new one if needed.
     """
     try:
-        print(f"[get_todays_meal_plan] Getting today's meal plan for user {current_user['email']}")
+        logger.debug("[get_todays_meal_plan] Getting today's meal plan for user %s", current_user["email"])
+        
+        # Profile lists, and the dietary flags derived from them, are read once for every step below
+        profile = current_user.get("profile", {})
+        dietary_restrictions = profile.get('dietaryRestrictions', [])
+        allergies = profile.get('allergies', [])
+        diet_type = profile.get('dietType', [])
+        is_vegetarian, no_eggs, nut_allergy = dietary_flags(dietary_restrictions, allergies, diet_type)
         
         # Fetch user's meal plan history
         meal_plans = await get_user_meal_plans(current_user["email"])
         
         # Today's date helper
         today = datetime.utcnow().date()
+        today_iso = today.isoformat()
         
         # Start with no plan selected
         todays_plan = None
+        # Most recent plan that actually contains array-style meals, found in the same pass
+        latest_plan = None
 
-        # Try to find a plan explicitly dated today
+        # Try to find a plan explicitly dated today; stored dates are ISO strings, so the
+        # YYYY-MM-DD prefix identifies the day without parsing
         for plan in meal_plans:
             plan_date = plan.get("date")
-            if plan_date:
-                try:
-                    if datetime.fromisoformat(plan_date).date() == today:
-                        todays_plan = plan
-                        break
-                except Exception:
-                    continue
+            if isinstance(plan_date, str) and plan_date[:10] == today_iso:
+                todays_plan = plan
+                break
+            if latest_plan is None and isinstance(plan.get("breakfast"), list) and isinstance(plan.get("lunch"), list):
+                latest_plan = plan
         
         # If still none, derive today's meals from the most recent saved plan
         if not todays_plan and meal_plans:
-            # Choose the most recent plan that actually contains array-style meals
-            latest_plan = None
-            for p in meal_plans:
-                if isinstance(p.get("breakfast"), list) and isinstance(p.get("lunch"), list):
-                    latest_plan = p
-                    break
             if latest_plan is None:
                 latest_plan = meal_plans[0]
             
@@ -6608,8 +6944,7 @@ async def get_todays_meal_plan(current_user: User = Depends(get_current_user)):
                 snack_val = "Apple slices with almond butter (fiber + protein)"
 
                 # Further tweak if user has nut allergy noted in plan/profile
-                allergies_list = current_user.get("profile", {}).get("allergies", [])
-                if any("nut" in a.lower() for a in allergies_list):
+                if nut_allergy:
                     snack_val = "Greek yogurt with fresh berries (low GI)"
 
             meals_dict["snack"] = snack_val
@@ -6622,7 +6957,7 @@ async def get_todays_meal_plan(current_user: User = Depends(get_current_user)):
         # Check if any meals are placeholders and generate concrete ones if needed
         if todays_plan and todays_plan.get("meals"):
             def _looks_placeholder(text: str) -> bool:
-                return any(keyword in text.lower() for keyword in ["healthy", "balanced", "nutritious", "option", "_"]) # Added _ to catch empty strings
+                return _PLACEHOLDER_MEAL_RE.search(text or "") is not None
 
             needs_generation = any(
                 _looks_placeholder(meal)
@@ -6630,10 +6965,8 @@ async def get_todays_meal_plan(current_user: User = Depends(get_current_user)):
             )
             
             if needs_generation:
-                print(f"[get_todays_meal_plan] Placeholder meals detected in today's plan – generating concrete recipes via OpenAI…")
+                logger.debug("[get_todays_meal_plan] Placeholder meals detected in today's plan – generating concrete recipes via OpenAI…")
 
-                profile = current_user.get("profile", {})
-                
                 # Use existing meals as a base for generation, fill in missing with generic prompts
                 current_meals = todays_plan["meals"]
                 breakfast_prompt = current_meals.get("breakfast", "a healthy breakfast option")
@@ -6642,18 +6975,8 @@ async def get_todays_meal_plan(current_user: User = Depends(get_current_user)):
                 snack_prompt = current_meals.get("snack", "a healthy snack option")
 
                 # Construct a more detailed prompt for the AI with stronger dietary enforcement
-                dietary_restrictions = profile.get('dietaryRestrictions', [])
-                allergies = profile.get('allergies', [])
-                diet_type = profile.get('dietType', [])
-                
                 # Build explicit restriction warnings
-                restriction_warnings = []
-                if 'vegetarian' in [r.lower() for r in dietary_restrictions] or 'vegetarian' in [d.lower() for d in diet_type]:
-                    restriction_warnings.append("STRICTLY VEGETARIAN - NO MEAT, POULTRY, FISH, OR SEAFOOD")
-                if any('egg' in r.lower() for r in dietary_restrictions) or any('egg' in a.lower() for a in allergies):
-                    restriction_warnings.append("NO EGGS - Avoid all egg-based dishes and ingredients")
-                if any('nut' in a.lower() for a in allergies):
-                    restriction_warnings.append("NUT ALLERGY - Avoid all nuts and nut-based products")
+                restriction_warnings = build_restriction_warnings(dietary_restrictions, allergies, diet_type)
                 
                 restriction_text = "\n".join([f"⚠️ {warning}" for warning in restriction_warnings])
                 
@@ -6698,39 +7021,23 @@ Examples of appropriate dishes:
 Ensure ALL dishes are completely vegetarian and egg-free. Do not include any meat, poultry, fish, seafood, or egg-based ingredients."""
 
                 try:
-                    ai_resp = client.chat.completions.create(
-                        model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+                    ai_resp = await asyncio.to_thread(
+                        client.chat.completions.create,
+                        model=AZURE_DEPLOYMENT,
                         messages=[{"role": "user", "content": prompt}],
                         temperature=0.7, # Slightly higher temperature for more creativity
                         max_tokens=500
                     )
 
-                    import json as _json
-                    ai_json = _json.loads(ai_resp.choices[0].message.content)
+                    ai_json = parse_json_object(ai_resp.choices[0].message.content)
                     
                     # Update only the meals that were placeholders or needed refinement
                     updated_meals = ai_json.get("meals", {})
                     
-                    # Post-process to ensure dietary compliance (safety filter)
-                    def sanitize_meal(meal_text: str) -> str:
-                        """Ensure meal is vegetarian and egg-free"""
-                        meal_lower = meal_text.lower()
-                        
-                        # Check for non-vegetarian ingredients
-                        non_veg_keywords = ['chicken', 'beef', 'pork', 'fish', 'salmon', 'tuna', 'turkey', 'lamb', 'meat', 'seafood', 'shrimp']
-                        egg_keywords = ['egg', 'eggs', 'omelet', 'omelette', 'scrambled', 'poached', 'fried egg']
-                        
-                        if any(keyword in meal_lower for keyword in non_veg_keywords):
-                            return "Vegetarian lentil and vegetable curry with quinoa"
-                        if any(keyword in meal_lower for keyword in egg_keywords):
-                            return "Overnight oats with almond milk, chia seeds, and fresh berries"
-                        
-                        return meal_text
-                    
                     for meal_type, dish_name in updated_meals.items():
                         if _looks_placeholder(current_meals.get(meal_type, "")) or dish_name != current_meals.get(meal_type, ""):
                             # Apply safety filter before saving
-                            todays_plan["meals"][meal_type] = sanitize_meal(dish_name)
+                            todays_plan["meals"][meal_type] = sanitize_generated_meal(dish_name)
 
                     todays_plan["type"] = "ai_generated_concrete"
                     todays_plan["notes"] = (todays_plan.get("notes", "") + " Meals made concrete by AI with dietary compliance.").strip()
@@ -6738,28 +7045,26 @@ Ensure ALL dishes are completely vegetarian and egg-free. Do not include any mea
                     # Save the updated plan to history
                     try:
                         await save_meal_plan(current_user["email"], todays_plan)
-                        print("[get_todays_meal_plan] Saved AI-generated concrete meals for today.")
+                        logger.debug("[get_todays_meal_plan] Saved AI-generated concrete meals for today.")
                     except ValueError as validation_err:
-                        print(f"[get_todays_meal_plan] Validation error saving concrete meals: {validation_err}")
+                        logger.warning("[get_todays_meal_plan] Validation error saving concrete meals: %s", validation_err)
                         # Don't save invalid/empty meal plans
                     except Exception as save_err:
-                        print(f"[get_todays_meal_plan] Error saving concrete meals: {save_err}")
+                        logger.warning("[get_todays_meal_plan] Error saving concrete meals: %s", save_err)
                 except Exception as gen_err:
-                    print(f"[get_todays_meal_plan] Error during concrete meal generation or parsing: {gen_err}")
-                    import traceback
-                    print(traceback.format_exc())
+                    logger.exception("[get_todays_meal_plan] Error during concrete meal generation or parsing: %s", gen_err)
 
+        # Today's consumption is loaded once and shared by the calibration, fresh-plan and recalibration steps below
+        today_consumption = await get_today_consumption_records_async(current_user["email"], user_timezone="UTC")
+        
         # ------------------
         # ADVANCED REAL-TIME CALIBRATION SYSTEM
         # ------------------
         try:
-            # Get today's consumption with detailed analysis
-            today_consumption_full = await get_today_consumption_records_async(current_user["email"], user_timezone="UTC")
-            
-            print(f"[CALIBRATION] Starting advanced calibration with {len(today_consumption_full)} consumption records")
+            logger.debug("[CALIBRATION] Starting advanced calibration with %d consumption records", len(today_consumption))
             
             # Analyze what was actually consumed vs. planned
-            consumption_analysis = await analyze_consumption_vs_plan(today_consumption_full, todays_plan)
+            consumption_analysis = await analyze_consumption_vs_plan(today_consumption, todays_plan)
             
             # Get current time to determine what meals are remaining
             now = datetime.utcnow()
@@ -6768,55 +7073,46 @@ Ensure ALL dishes are completely vegetarian and egg-free. Do not include any mea
             # Determine remaining meal types based on time of day
             remaining_meals = get_remaining_meals_by_time(current_hour)
             
-            print(f"[CALIBRATION] Current hour: {current_hour}, Remaining meals: {remaining_meals}")
-            print(f"[CALIBRATION] Consumption analysis: {consumption_analysis}")
+            logger.debug(
+                "[CALIBRATION] Current hour: %d, Remaining meals: %s; consumption analysis: %s",
+                current_hour, remaining_meals, consumption_analysis,
+            )
             
             # Apply consumption-aware meal plan generation
             todays_plan = await generate_consumption_aware_meal_plan(
                 todays_plan, 
                 consumption_analysis, 
                 remaining_meals,
-                current_user.get("profile", {})
+                profile
             )
             
             # Mark plan as calibrated if any consumption has occurred
-            if len(today_consumption_full) > 0:
+            if len(today_consumption) > 0:
+                calibrated_at = datetime.utcnow()
                 todays_plan["type"] = "real_time_calibrated"
-                todays_plan["last_calibrated"] = datetime.utcnow().isoformat()
+                todays_plan["last_calibrated"] = calibrated_at.isoformat()
                 todays_plan["calibration_trigger"] = "consumption_logged"
                 
                 # Save calibrated plan
                 try:
                     if "id" not in todays_plan or todays_plan["id"].startswith("derived_") or todays_plan["id"].startswith("fallback_"):
-                        todays_plan["id"] = f"calibrated_{current_user['email']}_{today.isoformat()}_{int(datetime.utcnow().timestamp())}"
-                        todays_plan["created_at"] = datetime.utcnow().isoformat()
+                        todays_plan["id"] = f"calibrated_{current_user['email']}_{today.isoformat()}_{int(calibrated_at.timestamp())}"
+                        todays_plan["created_at"] = calibrated_at.isoformat()
                     
                     await save_meal_plan(current_user["email"], todays_plan)
-                    print("[CALIBRATION] Saved real-time calibrated meal plan")
+                    logger.debug("[CALIBRATION] Saved real-time calibrated meal plan")
                 except Exception as save_err:
-                    print(f"[CALIBRATION] Error saving calibrated plan: {save_err}")
+                    logger.warning("[CALIBRATION] Error saving calibrated plan: %s", save_err)
 
         except Exception as e:
-            print(f"[CALIBRATION] Advanced calibration error: {e}")
-            import traceback
-            print(traceback.format_exc())
+            logger.exception("[CALIBRATION] Advanced calibration error: %s", e)
 
         # ALWAYS GENERATE FRESH VEGETARIAN MEAL PLANS - Don't use old plans that may contain non-vegetarian dishes
-        profile = current_user.get("profile", {})
-        dietary_restrictions = profile.get('dietaryRestrictions', [])
-        allergies = profile.get('allergies', [])
-        diet_type = profile.get('dietType', [])
-        
-        # Check if user is vegetarian or has egg restrictions
-        is_vegetarian = 'vegetarian' in [r.lower() for r in dietary_restrictions] or 'vegetarian' in [d.lower() for d in diet_type]
-        no_eggs = any('egg' in r.lower() for r in dietary_restrictions) or any('egg' in a.lower() for a in allergies)
-        
         # Always generate fresh diverse meals for users with dietary restrictions
         if is_vegetarian or no_eggs:
-            print(f"[get_todays_meal_plan] User has dietary restrictions - generating fresh diverse vegetarian meal plan")
+            logger.debug("[get_todays_meal_plan] User has dietary restrictions - generating fresh diverse vegetarian meal plan")
             
             # Use the new comprehensive recalibration system
-            today_consumption = await get_today_consumption_records_async(current_user["email"], user_timezone="UTC")
             calories_consumed = sum(r.get("nutritional_info", {}).get("calories", 0) for r in today_consumption)
             target_calories = int(profile.get('calorieTarget', '2000'))
             remaining_calories = max(0, target_calories - calories_consumed)
@@ -6830,14 +7126,14 @@ Ensure ALL dishes are completely vegetarian and egg-free. Do not include any mea
                 no_eggs,
                 dietary_restrictions,
                 allergies,
-                profile.get('dietType', []),
+                diet_type,
                 profile.get('foodPreferences', []),
                 profile.get('strongDislikes', [])
             )
             
             if fresh_plan:
                 todays_plan = fresh_plan
-                print(f"[get_todays_meal_plan] Generated fresh adaptive vegetarian meal plan")
+                logger.debug("[get_todays_meal_plan] Generated fresh adaptive vegetarian meal plan")
             else:
                 # Fallback to safe vegetarian meals
                 todays_plan = generate_safe_vegetarian_fallback(
@@ -6846,21 +7142,22 @@ Ensure ALL dishes are completely vegetarian and egg-free. Do not include any mea
                     is_vegetarian,
                     no_eggs
                 )
-                print(f"[get_todays_meal_plan] Used safe vegetarian fallback")
+                logger.debug("[get_todays_meal_plan] Used safe vegetarian fallback")
                 
         # Even for non-vegetarian users, ensure we use the recalibration system if consumption has occurred
         elif todays_plan:
             # Check if we have consumption today and need to recalibrate
-            today_consumption = await get_today_consumption_records_async(current_user["email"], user_timezone="UTC")
             if today_consumption:
-                print(f"[get_todays_meal_plan] User has consumption today - triggering recalibration")
+                logger.debug("[get_todays_meal_plan] User has consumption today - triggering recalibration")
                 try:
-                    updated_plan = await trigger_meal_plan_recalibration(current_user["email"], profile)
+                    updated_plan = await trigger_meal_plan_recalibration(
+                        current_user["email"], profile, today_consumption=today_consumption
+                    )
                     if updated_plan:
                         todays_plan = updated_plan
-                        print(f"[get_todays_meal_plan] Successfully recalibrated meal plan")
+                        logger.debug("[get_todays_meal_plan] Successfully recalibrated meal plan")
                 except Exception as recal_err:
-                    print(f"[get_todays_meal_plan] Error in recalibration: {recal_err}")
+                    logger.warning("[get_todays_meal_plan] Error in recalibration: %s", recal_err)
                     # Continue with existing plan
         
         # If no plan generated yet, use fallback
@@ -6880,18 +7177,17 @@ Ensure ALL dishes are completely vegetarian and egg-free. Do not include any mea
                 "notes": ""
             }
 
-        # Clean up any duplicate "(recommended)" tags that may have accumulated
+        # Clean up duplicate "(recommended)" tags and "Recommended:" prefixes that may have accumulated
         for _meal_key, _meal_text in todays_plan.get("meals", {}).items():
-            while " (recommended) (recommended)" in _meal_text:
-                _meal_text = _meal_text.replace(" (recommended) (recommended)", " (recommended)")
-            todays_plan["meals"][_meal_key] = _meal_text
+            if isinstance(_meal_text, str):
+                _meal_text = _DUP_REC_TAG.sub(" (recommended)", _meal_text)
+                todays_plan["meals"][_meal_key] = _DUP_REC_PREFIX.sub("Recommended: ", _meal_text)
 
         return todays_plan
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[get_todays_meal_plan] Unexpected error: {str(e)}")
-        print(f"[get_todays_meal_plan] Full error details:", traceback.format_exc())
+        logger.exception("[get_todays_meal_plan] Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to retrieve or generate meal plan: {str(e)}")
 
 
@@ -6912,56 +7208,39 @@ async def create_adaptive_meal_plan(
         # Get user's consumption history using existing function - INCREASED LIMIT to ensure we get ALL today's meals
         consumption_history = await get_user_consumption_history(current_user["email"], limit=300)
         
-        # Get user's meal plan history using existing function
-        meal_plan_history = await get_user_meal_plans(current_user["email"])
-        
         # Get user profile for preferences
         user_profile = current_user.get("profile", {})
         
-        # Analyze consumption patterns
-        favorite_foods = {}
-        total_meals = len(consumption_history)
+        # Analyze consumption patterns from the last 30 days in a single pass
+        favorite_foods = Counter()
+        total_recent_meals = 0
         diabetes_friendly_count = 0
         total_calories = 0
-        total_carbs = 0
-        total_protein = 0
-        
-        # Filter to last 30 days - USE PROPER TIMEZONE-AWARE FILTERING
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_consumption = []
         
         for entry in consumption_history:
             try:
                 entry_timestamp = datetime.fromisoformat(entry.get("timestamp", "").replace("Z", "+00:00"))
-                if entry_timestamp >= thirty_days_ago:
-                    recent_consumption.append(entry)
-            except:
+                if entry_timestamp < thirty_days_ago:
+                    continue
+            except Exception:
                 continue
-        
-        for entry in recent_consumption:
-            food_name = entry.get("food_name", "").lower()
-            favorite_foods[food_name] = favorite_foods.get(food_name, 0) + 1
             
-            # Get nutritional info
-            nutrition = entry.get("nutritional_info", {})
-            total_calories += nutrition.get("calories", 0)
-            total_carbs += nutrition.get("carbohydrates", 0)
-            total_protein += nutrition.get("protein", 0)
+            total_recent_meals += 1
+            favorite_foods[entry.get("food_name", "").lower()] += 1
+            total_calories += entry.get("nutritional_info", {}).get("calories", 0)
             
             # Check diabetes suitability
-            medical_rating = entry.get("medical_rating", {})
-            diabetes_suitability = medical_rating.get("diabetes_suitability", "").lower()
-            if diabetes_suitability in ["high", "good", "suitable"]:
+            diabetes_suitability = entry.get("medical_rating", {}).get("diabetes_suitability", "").lower()
+            if diabetes_suitability in ("high", "good", "suitable"):
                 diabetes_friendly_count += 1
         
         # Calculate metrics
-        total_recent_meals = len(recent_consumption)
         adherence_rate = (diabetes_friendly_count / total_recent_meals * 100) if total_recent_meals > 0 else 0
         avg_daily_calories = (total_calories / 30) if total_calories > 0 else 2000
         
         # Get top favorite foods
-        top_favorites = sorted(favorite_foods.items(), key=lambda x: x[1], reverse=True)[:10]
-        favorite_foods_list = [food for food, count in top_favorites]
+        favorite_foods_list = [food for food, count in favorite_foods.most_common(10)]
         
         # Get user preferences
         dietary_restrictions = user_profile.get("dietaryRestrictions", [])
@@ -7037,7 +7316,7 @@ Make each meal specific with exact portions and cooking methods. Ensure all {req
         
         try:
             response = client.chat.completions.create(
-                model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+                model=AZURE_DEPLOYMENT,
                 messages=[
                     {
                         "role": "system",
@@ -7105,7 +7384,7 @@ Make each meal specific with exact portions and cooking methods. Ensure all {req
                 
                 return breakfast_base[:req_days], lunch_base[:req_days], dinner_base[:req_days]
             
-            is_vegetarian = 'vegetarian' in [r.lower() for r in dietary_restrictions]
+            is_vegetarian, _, _ = dietary_flags(dietary_restrictions, allergies, diet_type)
             fallback_breakfast, fallback_lunch, fallback_dinner = get_fallback_meals(cuisine_preference, is_vegetarian)
             
             # Comprehensive fallback meal plan
@@ -7147,6 +7426,7 @@ Make each meal specific with exact portions and cooking methods. Ensure all {req
         # Save using existing database function
         try:
             saved_plan = await save_meal_plan(current_user["email"], meal_plan_data)
+            invalidate_meal_plan_cache(current_user["email"])
         except ValueError as validation_err:
             print(f"[create_adaptive_meal_plan] Validation error: {validation_err}")
             raise HTTPException(status_code=400, detail=f"Invalid meal plan data: {validation_err}")
@@ -7170,7 +7450,6 @@ Make each meal specific with exact portions and cooking methods. Ensure all {req
         
     except Exception as e:
         print(f"Error creating adaptive meal plan: {str(e)}")
-        import traceback
         print(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Failed to create adaptive meal plan: {str(e)}")
 
@@ -7652,7 +7931,7 @@ async def test_quick_log_food(food_data: dict):
         try:
             print("[test_quick_log_food] Calling OpenAI for nutritional analysis")
             response = client.chat.completions.create(
-                model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+                model=AZURE_DEPLOYMENT,
                 messages=[
                     {
                         "role": "system",
@@ -7673,10 +7952,7 @@ async def test_quick_log_food(food_data: dict):
             
             try:
                 # Extract JSON from response
-                start_idx = analysis_text.find('{')
-                end_idx = analysis_text.rfind('}') + 1
-                json_str = analysis_text[start_idx:end_idx]
-                analysis_data = json.loads(json_str)
+                analysis_data = parse_json_object(analysis_text)
                 print(f"[test_quick_log_food] Successfully parsed AI analysis: {analysis_data}")
             except (json.JSONDecodeError, ValueError) as parse_error:
                 print(f"[test_quick_log_food] JSON parsing error: {str(parse_error)}")
@@ -7702,6 +7978,7 @@ async def test_quick_log_food(food_data: dict):
         # Save to consumption history using the test user
         print(f"[test_quick_log_food] Saving consumption record for test user")
         consumption_record = await save_consumption_record("test@example.com", consumption_data)
+        invalidate_consumption_caches("test@example.com")
         print(f"[test_quick_log_food] Successfully saved consumption record with ID: {consumption_record['id']}")
         
         # Trigger meal plan recalibration
@@ -7765,7 +8042,7 @@ async def test_get_consumption_analytics(days: int = 7):
         print(f"[test_get_consumption_analytics] Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get consumption analytics: {str(e)}")
 
-@app.get("/test/coach/daily-insights")
+@app.get("/test/coach/daily-insights", response_class=ORJSONResponse)
 async def test_get_daily_insights():
     """Test daily insights without authentication"""
     try:
@@ -7806,14 +8083,12 @@ async def test_get_daily_insights():
                 "fat": 65
             },
             "diabetes_adherence": health_adherence,  # Now represents overall health adherence
-            "health_adherence": health_adherence,
             "health_conditions": health_conditions,
             "consistency_streak": max(0, weekly_analytics.get("total_meals", 0) // 2),
             "meals_logged_today": total_meals,
             "weekly_stats": {
                 "total_meals": weekly_analytics.get("total_meals", 0),
                 "diabetes_suitable_percentage": health_adherence,
-                "health_suitable_percentage": health_adherence,
                 "average_daily_calories": weekly_analytics.get("daily_averages", {}).get("calories", 0)
             },
             "recommendations": [
@@ -7991,19 +8266,20 @@ async def adapt_meal_plan_based_on_consumption(user_email: str, today_consumptio
             })
         
         # Create tomorrow's adapted meal plan
-        tomorrow = datetime.utcnow().date() + timedelta(days=1)
+        now = datetime.utcnow()
+        tomorrow = now.date() + timedelta(days=1)
         tomorrow_day_index = tomorrow.weekday()
         
         # Get base meals for tomorrow from the current plan
         adapted_plan = {
-            "id": f"adapted_{user_email}_{int(datetime.utcnow().timestamp())}",
+            "id": f"adapted_{user_email}_{int(now.timestamp())}",
             "user_id": user_email,
-            "created_at": datetime.utcnow().isoformat(),
+            "created_at": now.isoformat(),
             "type": "adaptive_meal_plan",
             "date": tomorrow.isoformat(),
             "adaptations": adaptations,
             "based_on_consumption": {
-                "date": datetime.utcnow().date().isoformat(),
+                "date": now.date().isoformat(),
                 "calories": today_calories,
                 "deviations": {
                     "calories": calorie_deviation,
@@ -8047,6 +8323,7 @@ async def adapt_meal_plan_based_on_consumption(user_email: str, today_consumptio
         
         # Save the adapted plan to database
         await save_meal_plan(user_email, adapted_plan)
+        invalidate_meal_plan_cache(user_email)
         
         return adapted_plan
         
@@ -8090,7 +8367,6 @@ async def get_meal_suggestion(
         try:
             consumption_history = await get_user_consumption_history(current_user["email"], limit=300)
             # Filter to last 30 days for comprehensive analysis
-            from datetime import datetime, timedelta
             thirty_days_ago = datetime.utcnow() - timedelta(days=30)
             recent_consumption = [
                 record for record in consumption_history 
@@ -8122,8 +8398,8 @@ async def get_meal_suggestion(
         
         # 5. Get consumption analytics for trends
         try:
-            weekly_analytics = await get_consumption_analytics(current_user["email"], 7)
-            monthly_analytics = await get_consumption_analytics(current_user["email"], 30)
+            weekly_analytics = await get_cached_consumption_analytics(current_user["email"], 7)
+            monthly_analytics = await get_cached_consumption_analytics(current_user["email"], 30)
         except Exception as e:
             print(f"[AI_COACH] Error fetching analytics: {e}")
             weekly_analytics = {}
@@ -8192,7 +8468,7 @@ async def get_meal_suggestion(
             calorie_goal = latest_meal_plan["dailyCalories"]
         
         # Health conditions and dietary info
-        health_conditions = user_profile.get("medicalConditions", []) or user_profile.get("medical_conditions", [])
+        health_conditions = get_medical_conditions(user_profile)
         dietary_restrictions = user_profile.get("dietaryRestrictions", []) or user_profile.get("dietary_restrictions", [])
         allergies = user_profile.get("allergies", [])
         medications = user_profile.get("currentMedications", [])
@@ -8328,7 +8604,7 @@ Be conversational but informative, like a knowledgeable nutrition coach who know
         # 🚀 GET AI RESPONSE FROM AZURE OPENAI
         try:
             response = client.chat.completions.create(
-                model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+                model=AZURE_DEPLOYMENT,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -8340,7 +8616,6 @@ Be conversational but informative, like a knowledgeable nutrition coach who know
             ai_response = response.choices[0].message.content.strip()
             
             # 🧹 CLEAN MARKDOWN FORMATTING for better frontend display
-            import re
             # Remove markdown headers
             ai_response = re.sub(r'^#{1,6}\s+', '', ai_response, flags=re.MULTILINE)
             # Remove markdown bold/italic
@@ -8399,7 +8674,6 @@ Be conversational but informative, like a knowledgeable nutrition coach who know
         
     except Exception as e:
         print(f"[AI_COACH] Critical error: {str(e)}")
-        import traceback
         traceback.print_exc()
         
         return {
@@ -8561,6 +8835,9 @@ async def fix_meal_types(current_user: User = Depends(get_current_user)):
                     print(f"[fix_meal_types] Error processing record {record.get('id', 'unknown')}: {str(e)}")
                     continue
         
+        if updated_count > 0:
+            invalidate_consumption_caches(current_user["email"])
+        
         return {
             "success": True,
             "message": f"Fixed meal types for {updated_count} consumption records",
@@ -8958,7 +9235,6 @@ def generate_consumption_pdf_section(consumption_history: List[dict], styles):
     for record in consumption_history[:10]:  # Last 10
         timestamp = record.get("timestamp", "Unknown")
         try:
-            from datetime import datetime
             if timestamp != "Unknown":
                 dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
                 formatted_date = dt.strftime("%m/%d/%Y")
@@ -9053,7 +9329,6 @@ def generate_chat_pdf_section(chat_history: List[dict], styles):
         timestamp = message.get("timestamp", "Unknown time")
         
         try:
-            from datetime import datetime
             if timestamp != "Unknown time":
                 dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
                 formatted_time = dt.strftime("%m/%d/%Y %I:%M %p")
@@ -9245,7 +9520,7 @@ async def generate_data_export_docx(export_data: dict, user_info: dict):
         - Date of Birth: {user_profile.get("dateOfBirth", "Not specified")}
         
         Medical Information:
-        - Medical Conditions: {", ".join(user_profile.get("medicalConditions", user_profile.get("medical_conditions", []))) or "None specified"}
+        - Medical Conditions: {", ".join(get_medical_conditions(user_profile)) or "None specified"}
         - Current Medications: {", ".join(user_profile.get("currentMedications", [])) or "None specified"}
         - Allergies: {", ".join(user_profile.get("allergies", [])) or "None specified"}
         